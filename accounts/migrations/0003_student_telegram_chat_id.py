@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_remove_user_role_student_teacher"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="student",
+            name="telegram_chat_id",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
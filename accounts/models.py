@@ -24,6 +24,8 @@ class Student(models.Model):
         on_delete=models.CASCADE,
         related_name="student_profile",
     )
+    # чат с ботом, куда отправляются результаты и объявления группы
+    telegram_chat_id = models.BigIntegerField(null=True, blank=True)
 
     def __str__(self) -> str:
         return self.user.username
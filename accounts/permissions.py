@@ -0,0 +1,50 @@
+from rest_framework import permissions
+
+from accounts.roles import get_membership
+
+
+class IsStudent(permissions.BasePermission):
+    message = "Доступно только студентам."
+
+    def has_permission(self, request, view):
+        return get_membership(request).is_student
+
+
+class IsTeacher(permissions.BasePermission):
+    message = "Доступно только преподавателям."
+
+    def has_permission(self, request, view):
+        return get_membership(request).is_teacher
+
+
+class IsTeacherOrStaff(permissions.BasePermission):
+    message = "Доступно только преподавателям."
+
+    def has_permission(self, request, view):
+        return request.user.is_staff or get_membership(request).is_teacher
+
+
+class IsStaffOrReadOnly(permissions.BasePermission):
+    message = "Изменять могут только администраторы."
+
+    def has_permission(self, request, view):
+        return request.method in permissions.SAFE_METHODS or request.user.is_staff
+
+
+class IsTeacherOrReadOnly(permissions.BasePermission):
+    """Изменять могут администраторы и преподаватели; объекты с полем
+    teacher (группы) — только их собственный преподаватель."""
+
+    message = "Изменять могут только преподаватели."
+
+    def has_permission(self, request, view):
+        if request.method in permissions.SAFE_METHODS or request.user.is_staff:
+            return True
+        return get_membership(request).is_teacher
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS or request.user.is_staff:
+            return True
+        if hasattr(obj, "teacher_id"):
+            return obj.teacher_id == get_membership(request).teacher_id
+        return True
@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from accounts.models import User
+
+# Запись кэша ролей — на пользователя. Изменение профиля, группы или состава
+# группы после COMMIT удаляет записи только затронутых пользователей; тёплый
+# запрос не обращается к базе за ролями вовсе.
+
+
+@dataclass(frozen=True)
+class Membership:
+    user_id: int | None
+    student_id: int | None = None
+    teacher_id: int | None = None
+    group_ids: frozenset = frozenset()
+    teaching_group_ids: frozenset = frozenset()
+
+    @property
+    def is_student(self):
+        return self.student_id is not None
+
+    @property
+    def is_teacher(self):
+        return self.teacher_id is not None
+
+
+def _cache():
+    return caches[settings.ROLE_CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f"membership:{user_id}"
+
+
+def load_membership(user_id):
+    # роль и все группы пользователя одним запросом (LEFT JOIN по профилям)
+    rows = User.objects.filter(pk=user_id).values_list(
+        "student_profile__id",
+        "teacher_profile__id",
+        "student_profile__group_memberships__group_id",
+        "teacher_profile__teaching_groups__id",
+    )
+    student_id = teacher_id = None
+    group_ids = set()
+    teaching_group_ids = set()
+    for student_id, teacher_id, group_id, teaching_group_id in rows:
+        if group_id is not None:
+            group_ids.add(group_id)
+        if teaching_group_id is not None:
+            teaching_group_ids.add(teaching_group_id)
+    return Membership(
+        user_id=user_id,
+        student_id=student_id,
+        teacher_id=teacher_id,
+        group_ids=frozenset(group_ids),
+        teaching_group_ids=frozenset(teaching_group_ids),
+    )
+
+
+def resolve(user):
+    if not user or not user.is_authenticated:
+        return Membership(user_id=None)
+    cache = _cache()
+    key = _key(user.pk)
+    membership = cache.get(key)
+    if membership is None:
+        membership = load_membership(user.pk)
+        cache.set(key, membership)
+    return membership
+
+
+def get_membership(request):
+    """Роль и группы текущего пользователя, один раз на запрос."""
+    http_request = getattr(request, "_request", request)
+    membership = getattr(http_request, "_membership", None)
+    if membership is None or membership.user_id != request.user.pk:
+        membership = resolve(request.user)
+        http_request._membership = membership
+    return membership
+
+
+def invalidate(user_ids):
+    # после COMMIT: иначе параллельный запрос успел бы снова закэшировать
+    # прежний состав; запись, прочитанную до COMMIT и положенную в кэш уже
+    # после удаления, ограничивает TIMEOUT кэша
+    keys = {_key(user_id) for user_id in user_ids if user_id is not None}
+    if keys:
+        transaction.on_commit(lambda: _cache().delete_many(keys))
+
+
+def _users_of_students(student_ids):
+    from accounts.models import Student
+
+    return list(
+        Student.objects.filter(pk__in=student_ids).values_list("user_id", flat=True)
+    )
+
+
+def _profile_changed(sender, instance, **kwargs):
+    invalidate([instance.user_id])
+
+
+def _group_saving(sender, instance, **kwargs):
+    # смена преподавателя группы меняет роли и прежнего преподавателя
+    if instance.pk:
+        instance._previous_teacher_id = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("teacher_id", flat=True)
+            .first()
+        )
+
+
+def _group_changed(sender, instance, **kwargs):
+    from accounts.models import Teacher
+
+    # студенты удалённой группы сбрасываются каскадом по GroupStudent
+    teacher_ids = {instance.teacher_id, getattr(instance, "_previous_teacher_id", None)}
+    invalidate(
+        Teacher.objects.filter(pk__in=teacher_ids).values_list("user_id", flat=True)
+    )
+
+
+def _membership_changed(sender, instance, **kwargs):
+    invalidate(_users_of_students([instance.student_id]))
+
+
+def _members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # group.students.* и student.groups.* не вызывают сигналов GroupStudent
+    if reverse:
+        if action.startswith("post_"):
+            invalidate([instance.user_id])
+        return
+    if action == "pre_clear":
+        instance._cleared_student_ids = list(
+            sender.objects.filter(group=instance).values_list("student_id", flat=True)
+        )
+    elif action == "post_clear":
+        invalidate(_users_of_students(instance._cleared_student_ids))
+    elif action in ("post_add", "post_remove"):
+        invalidate(_users_of_students(pk_set))
+
+
+def connect_signals():
+    from accounts.models import Student, Teacher
+    from learning.models import Group, GroupStudent
+
+    for sender in (Teacher, Student):
+        post_save.connect(_profile_changed, sender=sender)
+        post_delete.connect(_profile_changed, sender=sender)
+    pre_save.connect(_group_saving, sender=Group)
+    post_save.connect(_group_changed, sender=Group)
+    post_delete.connect(_group_changed, sender=Group)
+    post_save.connect(_membership_changed, sender=GroupStudent)
+    post_delete.connect(_membership_changed, sender=GroupStudent)
+    m2m_changed.connect(_members_changed, sender=GroupStudent)
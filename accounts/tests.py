@@ -1,3 +1,134 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import caches
 
-# Create your tests here.
+from accounts import roles
+from learning.models import Group, GroupStudent
+from learning.tests import LearningTestCase
+
+
+class MembershipCacheTests(LearningTestCase):
+    def cached(self, user):
+        return caches[settings.ROLE_CACHE_ALIAS].get(roles._key(user.pk))
+
+    def test_warm_request_runs_no_role_queries(self):
+        roles.resolve(self.teacher.user)
+        with self.assertNumQueries(0):
+            membership = roles.resolve(self.teacher.user)
+        self.assertEqual(membership.teaching_group_ids, {self.group.pk})
+
+    def test_membership_change_drops_only_affected_user_after_commit(self):
+        for user in (self.student.user, self.classmate.user, self.teacher.user):
+            roles.resolve(user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupStudent.objects.create(group=self.other_group, student=self.student)
+            # до COMMIT запрос закэшировал бы незакоммиченный состав
+            self.assertIsNotNone(self.cached(self.student.user))
+        self.assertIsNone(self.cached(self.student.user))
+        self.assertIsNotNone(self.cached(self.classmate.user))
+        self.assertIsNotNone(self.cached(self.teacher.user))
+        self.assertEqual(
+            roles.resolve(self.student.user).group_ids,
+            {self.group.pk, self.other_group.pk},
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.students.clear()
+        self.assertIsNone(self.cached(self.classmate.user))
+        self.assertEqual(roles.resolve(self.classmate.user).group_ids, frozenset())
+        self.assertTrue(roles.resolve(self.classmate.user).is_student)
+
+    def test_group_teacher_change_drops_both_teachers(self):
+        roles.resolve(self.teacher.user)
+        roles.resolve(self.other_teacher.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.teacher = self.other_teacher
+            self.group.save()
+        self.assertEqual(roles.resolve(self.teacher.user).teaching_group_ids, set())
+        self.assertEqual(
+            roles.resolve(self.other_teacher.user).teaching_group_ids,
+            {self.group.pk, self.other_group.pk},
+        )
+
+
+class WritePermissionTests(LearningTestCase):
+    def test_student_cannot_grant_themselves_staff(self):
+        client = self.client_for(self.student.user)
+        response = client.patch(
+            f"/api/user/{self.student.user.pk}/", {"is_staff": True}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+        self.student.user.refresh_from_db()
+        self.assertFalse(self.student.user.is_staff)
+        self.assertEqual(len(client.get("/api/student/").json()["results"]), 1)
+
+    def test_staff_cannot_change_privileges_through_api(self):
+        client = self.client_for(self.staff)
+        response = client.patch(
+            f"/api/user/{self.student.user.pk}/",
+            {"is_staff": True, "is_superuser": True, "first_name": "Ann"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.student.user.refresh_from_db()
+        self.assertEqual(self.student.user.first_name, "Ann")
+        self.assertFalse(self.student.user.is_staff or self.student.user.is_superuser)
+
+    def test_password_hash_is_not_exposed(self):
+        self.student.user.set_password("secret-password")
+        self.student.user.save()
+        client = self.client_for(self.teacher.user)
+        users = client.get("/api/user/").json()["results"]
+        self.assertIn(self.student.user.pk, [user["id"] for user in users])
+        self.assertTrue(all("password" not in user for user in users))
+        response = client.get("/api/user/", {"password": self.student.user.password})
+        self.assertEqual(len(response.json()["results"]), len(users))
+
+    def test_students_cannot_write_profiles_groups_or_topics(self):
+        client = self.client_for(self.student.user)
+        requests = [
+            ("delete", f"/api/group/{self.group.pk}/"),
+            ("patch", f"/api/group/{self.group.pk}/"),
+            ("post", "/api/group/"),
+            ("patch", f"/api/topic/{self.topic.pk}/"),
+            ("delete", f"/api/topic/{self.topic.pk}/"),
+            ("patch", f"/api/student/{self.student.pk}/"),
+            ("delete", f"/api/user/{self.student.user.pk}/"),
+        ]
+        for method, url in requests:
+            with self.subTest(method=method, url=url):
+                response = getattr(client, method)(url, {"name": "x"}, format="json")
+                self.assertEqual(response.status_code, 403)
+        self.assertTrue(Group.objects.filter(pk=self.group.pk).exists())
+
+    def test_teacher_writes_only_own_groups(self):
+        client = self.client_for(self.teacher.user)
+        response = client.patch(
+            f"/api/group/{self.group.pk}/",
+            {"description": "new", "teacher": self.other_teacher.pk},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.description, "new")
+        self.assertEqual(self.group.teacher_id, self.teacher.pk)
+
+        # чужая группа скрыта scoping
+        response = client.delete(f"/api/group/{self.other_group.pk}/")
+        self.assertEqual(response.status_code, 404)
+        response = client.post(
+            "/api/group/",
+            {"name": "new-group", "teacher": self.other_teacher.pk},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["teacher"], self.teacher.pk)
+
+        response = client.patch(
+            f"/api/topic/{self.topic.pk}/", {"description": "d"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = client.patch(
+            f"/api/student/{self.student.pk}/", {"telegram_chat_id": 1}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
@@ -1,9 +1,13 @@
 from django_filters import FilterSet, filters
-from rest_framework import serializers, viewsets
+from rest_framework import permissions, serializers, viewsets
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 
 from accounts.models import Student, Teacher, User
+from accounts.permissions import IsStaffOrReadOnly
+from learning.fast_serializers import FastListMixin, ValuesSerializer
+from learning.scoping import scope_students, scope_teachers, scope_users
+from learning.streaming import StreamingListMixin
 
 
 class UserSetFilter(FilterSet):
@@ -11,21 +15,26 @@ class UserSetFilter(FilterSet):
 
     class Meta:
         model = User
-        fields = "__all__"
+        exclude = ("password", "groups", "user_permissions")
 
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = "__all__"
+        # хэш пароля и права не отдаются и не меняются через API
+        exclude = ("password", "groups", "user_permissions")
+        read_only_fields = ("is_staff", "is_superuser", "last_login", "date_joined")
 
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.filter()
+class UserViewSet(StreamingListMixin, viewsets.ModelViewSet):
+    queryset = User.objects.order_by("id")
     serializer_class = UserSerializer
+    permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
     filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = UserSetFilter
-    # permission_classes = [DjangoModelPermissionsOrAnonReadOnly]
+
+    def get_queryset(self):
+        return scope_users(super().get_queryset(), self.request)
 
 
 class TeacherSetFilter(FilterSet):
@@ -40,12 +49,21 @@ class TeacherSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class TeacherViewSet(viewsets.ModelViewSet):
-    queryset = Teacher.objects.filter()
+class TeacherFastSerializer(ValuesSerializer):
+    fields = ("id", "user")
+
+
+class TeacherViewSet(StreamingListMixin, FastListMixin, viewsets.ModelViewSet):
+    queryset = Teacher.objects.order_by("id")
     serializer_class = TeacherSerializer
+    fast_serializer_class = TeacherFastSerializer
+    permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
     filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = TeacherSetFilter
 
+    def get_queryset(self):
+        return scope_teachers(super().get_queryset(), self.request)
+
 
 class StudentSetFilter(FilterSet):
     class Meta:
@@ -59,8 +77,17 @@ class StudentSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class StudentViewSet(viewsets.ModelViewSet):
-    queryset = Student.objects.filter()
+class StudentFastSerializer(ValuesSerializer):
+    fields = ("id", "telegram_chat_id", "user")
+
+
+class StudentViewSet(StreamingListMixin, FastListMixin, viewsets.ModelViewSet):
+    queryset = Student.objects.order_by("id")
     serializer_class = StudentSerializer
+    fast_serializer_class = StudentFastSerializer
+    permission_classes = [permissions.IsAuthenticated, IsStaffOrReadOnly]
     filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = StudentSetFilter
+
+    def get_queryset(self):
+        return scope_students(super().get_queryset(), self.request)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,9 @@ AUTH_USER_MODEL = "accounts.User"
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # сжимает и потоковые ответы (?stream=1), если клиент прислал Accept-Encoding
+    "django.middleware.gzip.GZipMiddleware",
+    "learning.replicas.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -80,8 +84,34 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
     "DEFAULT_PAGINATION_CLASS": "learning.pagination.PagePagination",
     "PAGE_SIZE": 20,
+    # действует только на view с throttle_scope из LEARNING_THROTTLES
+    "DEFAULT_THROTTLE_CLASSES": ["learning.throttling.ScopedTokenBucketThrottle"],
 }
 
+# Корзины токенов для тяжёлых эндпоинтов: rate — скорость пополнения,
+# burst — ёмкость корзины пользователя; group_rate/group_burst — общая
+# корзина каждой группы студента. Переопределения: "users": {user_id: {...}},
+# "groups": {group_id: {...}}.
+LEARNING_THROTTLES = {
+    "attempt_start": {"rate": "10/min", "burst": 5},
+    "attempt_answer": {
+        "rate": "120/min",
+        "burst": 30,
+        "group_rate": "3000/min",
+        "group_burst": 600,
+    },
+    "attempt_complete": {"rate": "10/min", "burst": 5},
+    "reports": {"rate": "30/min", "burst": 10},
+}
+THROTTLE_STORE_PATH = BASE_DIR / ".cache" / "throttle.sqlite3"
+
+# POST /api/batch/: подзапросов в пакете и потоков для параллельных GET
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# ?since=<token> у /api/topic/, /api/question/, /api/group/: строк за ответ
+CHANGE_FEED_LIMIT = 500
+
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
@@ -89,9 +119,88 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # ждём освобождения блокировки вместо мгновенного "database is locked"
+        "OPTIONS": {"timeout": 20},
     }
 }
 
+# Реплика для чтения списков и отчётов (learning/replicas.py). Локально —
+# копия db.sqlite3, путь задаётся переменной DATABASE_REPLICA_PATH.
+if os.environ.get("DATABASE_REPLICA_PATH"):
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ["DATABASE_REPLICA_PATH"],
+        "OPTIONS": {"timeout": 20},
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["learning.replicas.ReplicaRouter"]
+REPLICA_DATABASE = "replica"
+# после записи сессия REPLICA_STICKY_SECONDS читает из основной базы
+REPLICA_STICKY_SECONDS = 10
+# при большем отставании реплики отчёты читаются из основной базы
+REPLICA_MAX_LAG_SECONDS = 5
+# как часто команда replica_heartbeat пишет строку пульса ReplicaHeartbeat
+REPLICA_HEARTBEAT_SECONDS = 1
+# безопасные запросы, которые можно обслуживать с реплики
+REPLICA_READ_PATHS = [
+    r"^/api/(topic|question|group|user|teacher|student|attempt|archived-attempt)/$",
+    r"^/api/(topic|group)/\d+/(leaderboard|stats)/$",
+    r"^/api/archived-attempt/\d+/$",
+]
+
+# Попытки в статусе in_progress старше этого срока считаются брошенными
+# (см. manage.py abandon_stale_attempts).
+ATTEMPT_ABANDON_TIMEOUT_MINUTES = 180
+
+# Сколько вопросов выдаётся в одной попытке.
+ATTEMPT_QUESTION_COUNT = 10
+
+# Автосохранения одного ответа чаще этого окна склеиваются в одну запись;
+# окно и отложенный выбор хранятся в отдельном SQLite-файле, общем для
+# процессов машины (learning.attempts.PendingAnswerStore).
+AUTOSAVE_COALESCE_SECONDS = 2
+AUTOSAVE_STORE_PATH = BASE_DIR / ".cache" / "autosave.sqlite3"
+
+# Завершённые и брошенные попытки старше срока хранения переносятся
+# в сжатые JSON Lines файлы (manage.py archive_attempts).
+ATTEMPT_RETENTION_DAYS = 365
+ATTEMPT_ARCHIVE_DIR = BASE_DIR / "archive"
+
+# Фоновые задачи (learning/jobs.py, manage.py run_workers). Задача, чей
+# воркер не отчитывался дольше JOB_LEASE_SECONDS, возвращается в очередь;
+# повтор после ошибки — через JOB_RETRY_DELAY_SECONDS * 2^(попытка - 1).
+JOB_WORKER_THREADS = 4
+JOB_LEASE_SECONDS = 15 * 60
+JOB_RETRY_DELAY_SECONDS = 30
+JOB_EXPORT_DIR = BASE_DIR / "exports"
+
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # роли и группы пользователей (accounts.roles): общий для всех
+    # процессов на машине, ограничен по размеру
+    "roles": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache" / "roles",
+        "TIMEOUT": 10 * 60,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+    # разборы завершённых попыток (learning.reviews): без срока жизни,
+    # сбрасываются при комментарии преподавателя или перепроверке
+    "reviews": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache" / "reviews",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
+}
+
+ROLE_CACHE_ALIAS = "roles"
+REVIEW_CACHE_ALIAS = "reviews"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -128,3 +237,13 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = "static/"
+
+
+# Telegram-уведомления (learning/notifications.py). TELEGRAM_API_BASE можно
+# направить на локальную заглушку Bot API.
+TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
+TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org")
+# Bot API пропускает около 30 сообщений в секунду на бота
+TELEGRAM_RATE = "25/s"
+TELEGRAM_CONCURRENCY = 20
+TELEGRAM_MAX_RETRIES = 5
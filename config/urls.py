@@ -25,9 +25,21 @@ from accounts import views as accounts_views
 
 router = DefaultRouter()
 router.register(r"topic", learning_views.TopicViewSet, basename="topic")
+router.register(r"question", learning_views.QuestionViewSet, basename="question")
 router.register(r"group", learning_views.GroupViewSet, basename="group")
+router.register(r"attempt", learning_views.AttemptViewSet, basename="attempt")
+router.register(
+    r"archived-attempt",
+    learning_views.ArchivedAttemptViewSet,
+    basename="archived-attempt",
+)
+router.register(r"job", learning_views.JobViewSet, basename="job")
 router.register(r"user", accounts_views.UserViewSet, basename="user")
 router.register(r"teacher", accounts_views.TeacherViewSet, basename="teacher")
 router.register(r"student", accounts_views.StudentViewSet, basename="student")
 
-urlpatterns = [path("admin/", admin.site.urls), path("api/", include(router.urls))]
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("api/batch/", learning_views.BatchView.as_view(), name="batch"),
+    path("api/", include(router.urls)),
+]
@@ -1,12 +1,17 @@
 from django.contrib import admin
 from .models import (
     Answer,
+    AnswerChoice,
     Attempt,
+    AttemptEvent,
     AttemptQuestion,
     Choice,
+    EventCheckpoint,
     Group,
     GroupStudent,
+    Job,
     Question,
+    QuestionSnapshot,
     Topic,
 )
 
@@ -44,6 +49,7 @@ class AttemptQuestionInline(admin.TabularInline):
     model = AttemptQuestion
     extra = 0
     autocomplete_fields = ("question",)
+    readonly_fields = ("snapshot",)
     ordering = ("order",)
 
 
@@ -61,6 +67,7 @@ class AttemptQuestionAdmin(admin.ModelAdmin):
     list_display = ("id", "attempt", "order", "question")
     list_filter = ("attempt__topic",)
     autocomplete_fields = ("attempt", "question")
+    readonly_fields = ("snapshot",)
     ordering = ("attempt", "order")
 
     search_fields = (
@@ -73,12 +80,33 @@ class AttemptQuestionAdmin(admin.ModelAdmin):
     inlines = (AnswerInline,)
 
 
+@admin.register(QuestionSnapshot)
+class QuestionSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("id", "question", "content_hash", "created_at")
+    search_fields = ("content_hash",)
+    raw_id_fields = ("question",)
+
+    # слепки неизменяемы: на них ссылаются выданные вопросы попыток
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class AnswerChoiceInline(admin.TabularInline):
+    model = AnswerChoice
+    extra = 0
+    raw_id_fields = ("choice",)
+
+
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
     list_display = ("id", "attempt_question", "is_correct", "answered_at")
     list_filter = ("is_correct", "attempt_question__attempt__topic")
     search_fields = ("answer_text", "teacher_comment")
     autocomplete_fields = ("attempt_question",)
+    inlines = [AnswerChoiceInline]
 
 
 class GroupStudentInline(admin.TabularInline):
@@ -94,3 +122,28 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ("name",)
     autocomplete_fields = ("teacher",)
     inlines = (GroupStudentInline,)
+
+
+@admin.register(AttemptEvent)
+class AttemptEventAdmin(admin.ModelAdmin):
+    list_display = ("id", "attempt_id", "kind", "created_at")
+    list_filter = ("kind",)
+
+    # журнал только дополняется
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(EventCheckpoint)
+class EventCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("name", "last_event_id", "updated_at")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "priority", "progress", "created_at")
+    list_filter = ("status", "kind")
+    raw_id_fields = ("created_by",)
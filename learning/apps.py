@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class LearningConfig(AppConfig):
     name = 'learning'
+
+    def ready(self):
+        from learning import changefeed, leaderboards, reviews
+
+        reviews.connect_signals()
+        changefeed.connect_signals()
+        leaderboards.connect_signals()
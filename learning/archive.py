@@ -0,0 +1,235 @@
+import gzip
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from learning.models import (
+    Answer,
+    ArchivedAttempt,
+    Attempt,
+    AttemptQuestion,
+    Choice,
+    Question,
+)
+from learning.snapshots import freeze
+
+ARCHIVABLE_STATUSES = (Attempt.Status.COMPLETED, Attempt.Status.ABANDONED)
+
+
+def archive_dir():
+    path = Path(settings.ATTEMPT_ARCHIVE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _dt(value):
+    return value.isoformat() if value else None
+
+
+def _collect(ids):
+    # вся попытка целиком — четырьмя запросами на пачку
+    attempts = list(Attempt.objects.filter(pk__in=ids).order_by("pk"))
+    questions = {}
+    for aq in AttemptQuestion.objects.filter(attempt_id__in=ids).values(
+        "id", "attempt_id", "question_id", "snapshot_id", "order"
+    ):
+        questions.setdefault(aq["attempt_id"], []).append(aq)
+    answers = {
+        answer["attempt_question_id"]: answer
+        for answer in Answer.objects.filter(
+            attempt_question__attempt_id__in=ids
+        ).values(
+            "id", "attempt_question_id", "answered_at", "is_correct", "teacher_comment"
+        )
+    }
+    selected = {}
+    for answer_id, choice_id in Answer.selected_choices.through.objects.filter(
+        answer__attempt_question__attempt_id__in=ids
+    ).values_list("answer_id", "choice_id"):
+        selected.setdefault(answer_id, []).append(choice_id)
+
+    records = []
+    for attempt in attempts:
+        items = []
+        for aq in sorted(questions.get(attempt.pk, []), key=lambda row: row["order"]):
+            answer = answers.get(aq["id"])
+            items.append(
+                {
+                    "id": aq["id"],
+                    "question": aq["question_id"],
+                    "snapshot": aq["snapshot_id"],
+                    "order": aq["order"],
+                    "answer": answer
+                    and {
+                        "id": answer["id"],
+                        "answered_at": _dt(answer["answered_at"]),
+                        "is_correct": answer["is_correct"],
+                        "teacher_comment": answer["teacher_comment"],
+                        "selected_choices": sorted(selected.get(answer["id"], [])),
+                    },
+                }
+            )
+        records.append(
+            (
+                attempt,
+                {
+                    "id": attempt.pk,
+                    "student": attempt.student_id,
+                    "topic": attempt.topic_id,
+                    "status": attempt.status,
+                    "started_at": _dt(attempt.started_at),
+                    "finished_at": _dt(attempt.finished_at),
+                    "score": attempt.score,
+                    "questions": items,
+                },
+            )
+        )
+    return records
+
+
+def archive_batch(ids):
+    records = _collect(ids)
+    if not records:
+        return 0
+
+    name = f"attempts-{timezone.now():%Y%m%d%H%M%S}-{records[0][0].pk}.jsonl.gz"
+    path = archive_dir() / name
+    tmp_path = path.with_suffix(".tmp")
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as fh:
+        for _, record in records:
+            fh.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            fh.write("\n")
+    os.replace(tmp_path, path)
+
+    with transaction.atomic():
+        ArchivedAttempt.objects.bulk_create(
+            ArchivedAttempt(
+                id=attempt.pk,
+                student_id=attempt.student_id,
+                topic_id=attempt.topic_id,
+                status=attempt.status,
+                started_at=attempt.started_at,
+                finished_at=attempt.finished_at,
+                score=attempt.score,
+                question_count=len(record["questions"]),
+                archive_file=name,
+                archive_line=line,
+            )
+            for line, (attempt, record) in enumerate(records)
+        )
+        Attempt.objects.filter(pk__in=[attempt.pk for attempt, _ in records]).delete()
+    return len(records)
+
+
+def _read_lines(name):
+    with gzip.open(archive_dir() / name, "rt", encoding="utf-8") as fh:
+        yield from fh
+
+
+def load_record(archived):
+    for line_no, line in enumerate(_read_lines(archived.archive_file)):
+        if line_no == archived.archive_line:
+            return json.loads(line)
+    return None
+
+
+def restore(archived_attempts):
+    """Возвращает попытки из архива в рабочие таблицы.
+
+    Попытки, чьи вопросы или варианты с тех пор удалены, пропускаются.
+    Возвращает (restored, skipped).
+    """
+    by_file = {}
+    for archived in archived_attempts:
+        by_file.setdefault(archived.archive_file, {})[archived.archive_line] = archived
+
+    restored = skipped = 0
+    for name, wanted in by_file.items():
+        for line_no, line in enumerate(_read_lines(name)):
+            if line_no not in wanted:
+                continue
+            record = json.loads(line)
+            if not _references_exist(record):
+                skipped += 1
+                continue
+            try:
+                with transaction.atomic():
+                    _restore_record(record)
+                    wanted[line_no].delete()
+                restored += 1
+            except IntegrityError:
+                skipped += 1
+    return restored, skipped
+
+
+def _references_exist(record):
+    # SQLite проверяет внешние ключи только при COMMIT: внутри внешней
+    # транзакции (задача, тест) ссылка на удалённый вопрос прошла бы
+    question_ids = {item["question"] for item in record["questions"]}
+    choice_ids = {
+        choice_id
+        for item in record["questions"]
+        if item["answer"]
+        for choice_id in item["answer"]["selected_choices"]
+    }
+    return Question.objects.filter(pk__in=question_ids).count() == len(
+        question_ids
+    ) and Choice.objects.filter(pk__in=choice_ids).count() == len(choice_ids)
+
+
+def _restore_record(record):
+    attempt = Attempt(
+        id=record["id"],
+        student_id=record["student"],
+        topic_id=record["topic"],
+        status=record["status"],
+        started_at=parse_datetime(record["started_at"]),
+        finished_at=record["finished_at"] and parse_datetime(record["finished_at"]),
+        score=record["score"],
+    )
+    started_at = attempt.started_at
+    Attempt.objects.bulk_create([attempt])
+    # auto_now_add перезаписывает started_at при создании — возвращаем исходное
+    attempt.started_at = started_at
+    Attempt.objects.bulk_update([attempt], ["started_at"])
+
+    # в архивах до появления слепков их нет — снимаем с текущих вопросов
+    frozen = freeze(
+        [item["question"] for item in record["questions"] if not item.get("snapshot")]
+    )
+    AttemptQuestion.objects.bulk_create(
+        AttemptQuestion(
+            id=item["id"],
+            attempt_id=attempt.pk,
+            question_id=item["question"],
+            snapshot_id=item.get("snapshot") or frozen[item["question"]],
+            order=item["order"],
+        )
+        for item in record["questions"]
+    )
+    answers = [
+        item["answer"] | {"aq": item["id"]}
+        for item in record["questions"]
+        if item["answer"]
+    ]
+    Answer.objects.bulk_create(
+        Answer(
+            id=answer["id"],
+            attempt_question_id=answer["aq"],
+            answered_at=answer["answered_at"] and parse_datetime(answer["answered_at"]),
+            is_correct=answer["is_correct"],
+            teacher_comment=answer["teacher_comment"],
+        )
+        for answer in answers
+    )
+    through = Answer.selected_choices.through
+    through.objects.bulk_create(
+        through(answer_id=answer["id"], choice_id=choice_id)
+        for answer in answers
+        for choice_id in answer["selected_choices"]
+    )
@@ -0,0 +1,247 @@
+import json
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from learning import events, leaderboards, reviews
+from learning.localstore import LocalStore
+from learning.models import Answer, Attempt, AttemptEvent, AttemptQuestion, Question
+from learning.snapshots import freeze
+
+
+class AttemptClosed(Exception):
+    pass
+
+
+def start_attempt(student_id, topic):
+    question_ids = list(
+        Question.objects.filter(topic=topic, is_active=True)
+        .order_by("?")
+        .values_list("pk", flat=True)[: settings.ATTEMPT_QUESTION_COUNT]
+    )
+    with transaction.atomic():
+        attempt = Attempt.objects.create(student_id=student_id, topic=topic)
+        snapshot_ids = freeze(question_ids)
+        AttemptQuestion.objects.bulk_create(
+            AttemptQuestion(
+                attempt=attempt,
+                question_id=question_id,
+                snapshot_id=snapshot_ids[question_id],
+                order=order,
+            )
+            for order, question_id in enumerate(question_ids, start=1)
+        )
+        events.record(
+            attempt.pk,
+            AttemptEvent.Kind.STARTED,
+            topic=topic.pk,
+            student=student_id,
+            questions=len(question_ids),
+        )
+    return attempt
+
+
+def save_answer(attempt_question, choice_ids):
+    # пишем только разницу: новые строки M2M вставляем, снятые удаляем,
+    # вместо clear() + add() на каждое сохранение
+    through = Answer.selected_choices.through
+    wanted = set(choice_ids)
+    with transaction.atomic():
+        answer, _ = Answer.objects.get_or_create(attempt_question=attempt_question)
+        current = set(
+            through.objects.filter(answer_id=answer.pk).values_list(
+                "choice_id", flat=True
+            )
+        )
+        removed = current - wanted
+        added = wanted - current
+        if removed:
+            through.objects.filter(answer_id=answer.pk, choice_id__in=removed).delete()
+        if added:
+            through.objects.bulk_create(
+                through(answer_id=answer.pk, choice_id=choice_id) for choice_id in added
+            )
+        if added or removed or answer.answered_at is None:
+            answer.answered_at = timezone.now()
+            Answer.objects.filter(pk=answer.pk).update(answered_at=answer.answered_at)
+            events.record(
+                attempt_question.attempt_id,
+                AttemptEvent.Kind.ANSWERED,
+                attempt_question=attempt_question.pk,
+                question=attempt_question.question_id,
+                choices=sorted(wanted),
+            )
+    return answer
+
+
+class PendingAnswerStore(LocalStore):
+    """Окно склейки автосохранений и отложенные в нём выборы.
+
+    Лежит вне основной БД: склеенное сохранение не берёт её блокировку
+    записи. Строка ответа живёт, пока попытка не закрыта.
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS pending ("
+        "attempt_question INTEGER PRIMARY KEY, attempt INTEGER NOT NULL, "
+        "written REAL NOT NULL, choices TEXT)"
+    )
+
+    def coalesce(self, attempt_question, choice_ids, window):
+        """Откладывает выбор, если ответ записан меньше window секунд назад.
+
+        Иначе отмечает новую запись ответа: отложенный ранее выбор заменяет
+        текущий. Возвращает True, если выбор отложен.
+        """
+        now = time.time()
+        choices = json.dumps(sorted(choice_ids))
+        with self.immediate() as conn:
+            row = conn.execute(
+                "SELECT written FROM pending WHERE attempt_question = ?",
+                (attempt_question.pk,),
+            ).fetchone()
+            if row is not None and now - row[0] < window:
+                conn.execute(
+                    "UPDATE pending SET choices = ? WHERE attempt_question = ?",
+                    (choices, attempt_question.pk),
+                )
+                return True
+            conn.execute(
+                "INSERT INTO pending (attempt_question, attempt, written) "
+                "VALUES (?, ?, ?) ON CONFLICT(attempt_question) DO UPDATE SET "
+                "written = excluded.written, choices = NULL",
+                (attempt_question.pk, attempt_question.attempt_id, now),
+            )
+        return False
+
+    def pending(self, attempt_ids):
+        # {attempt_question_id: choices_json}
+        marks = ",".join("?" * len(attempt_ids))
+        return dict(
+            self.connection().execute(
+                "SELECT attempt_question, choices FROM pending "
+                f"WHERE attempt IN ({marks}) AND choices IS NOT NULL",
+                list(attempt_ids),
+            )
+        )
+
+    def forget(self, attempt_ids, flushed):
+        # выбор, отложенный уже после чтения pending(), остаётся
+        marks = ",".join("?" * len(attempt_ids))
+        with self.immediate() as conn:
+            conn.executemany(
+                "DELETE FROM pending WHERE attempt_question = ? AND choices = ?",
+                flushed.items(),
+            )
+            conn.execute(
+                f"DELETE FROM pending WHERE attempt IN ({marks}) "
+                "AND choices IS NULL",
+                list(attempt_ids),
+            )
+
+
+_pending_store = None
+
+
+def get_pending_store():
+    global _pending_store
+    if _pending_store is None:
+        _pending_store = PendingAnswerStore(settings.AUTOSAVE_STORE_PATH)
+    return _pending_store
+
+
+def autosave_answer(attempt_question, choice_ids):
+    """Сохраняет ответ, склеивая частые сохранения в одну запись.
+
+    Если с прошлой записи прошло меньше AUTOSAVE_COALESCE_SECONDS, выбор
+    откладывается в PendingAnswerStore, основная БД не пишется. Отложенный
+    выбор переносится в selected_choices следующим сохранением вне окна
+    или flush_pending_answers(). Возвращает True, если запись была.
+    """
+    if get_pending_store().coalesce(
+        attempt_question, choice_ids, settings.AUTOSAVE_COALESCE_SECONDS
+    ):
+        return False
+    save_answer(attempt_question, choice_ids)
+    return True
+
+
+def flush_pending_answers(attempt_ids):
+    """Переносит отложенные выборы закрываемых попыток в основную БД."""
+    attempt_ids = list(attempt_ids)
+    store = get_pending_store()
+    flushed = store.pending(attempt_ids)
+    attempt_questions = AttemptQuestion.objects.in_bulk(flushed)
+    for pk, choices in flushed.items():
+        save_answer(attempt_questions[pk], json.loads(choices))
+    # снимаем после COMMIT: при откате выборы остаются отложенными
+    transaction.on_commit(lambda: store.forget(attempt_ids, flushed))
+    return len(flushed)
+
+
+def grade_attempt(attempt):
+    # проверяем все ответы попытки тремя запросами, без обхода по вопросам;
+    # верные варианты берём из слепков, а не из текущих Choice
+    question_ids = {}
+    correct = {}
+    for pk, question_id, data in AttemptQuestion.objects.filter(
+        attempt=attempt
+    ).values_list("pk", "question_id", "snapshot__data"):
+        question_ids[pk] = question_id
+        correct[pk] = set(data["correct"])
+
+    selected = {}
+    for answer_id, choice_id in Answer.selected_choices.through.objects.filter(
+        answer__attempt_question__attempt=attempt
+    ).values_list("answer_id", "choice_id"):
+        selected.setdefault(answer_id, set()).add(choice_id)
+
+    answers = list(Answer.objects.filter(attempt_question__attempt=attempt))
+    graded = []
+    for answer in answers:
+        previous = answer.is_correct
+        answer.is_correct = (
+            selected.get(answer.pk, set()) == correct[answer.attempt_question_id]
+        )
+        payload = {
+            "topic": attempt.topic_id,
+            "question": question_ids[answer.attempt_question_id],
+            "is_correct": answer.is_correct,
+        }
+        # при перепроверке в журнал идут только изменившиеся ответы
+        if previous is None:
+            graded.append((attempt.pk, AttemptEvent.Kind.GRADED, payload))
+        elif previous != answer.is_correct:
+            payload["previous"] = previous
+            graded.append((attempt.pk, AttemptEvent.Kind.GRADED, payload))
+    Answer.objects.bulk_update(answers, ["is_correct"])
+    reviews.invalidate(attempt.pk)
+    events.record_many(graded)
+    return sum(answer.is_correct for answer in answers)
+
+
+def complete_attempt(attempt):
+    flush_pending_answers([attempt.pk])
+    with transaction.atomic():
+        finished_at = timezone.now()
+        # условное обновление: попытку мог уже закрыть abandon_stale_attempts
+        closed = Attempt.objects.filter(
+            pk=attempt.pk, status=Attempt.Status.IN_PROGRESS
+        ).update(status=Attempt.Status.COMPLETED, finished_at=finished_at)
+        if not closed:
+            raise AttemptClosed(attempt.pk)
+        attempt.status = Attempt.Status.COMPLETED
+        attempt.finished_at = finished_at
+        attempt.score = grade_attempt(attempt)
+        Attempt.objects.filter(pk=attempt.pk).update(score=attempt.score)
+        events.record(
+            attempt.pk,
+            AttemptEvent.Kind.COMPLETED,
+            topic=attempt.topic_id,
+            student=attempt.student_id,
+            score=attempt.score,
+        )
+        leaderboards.record_result(attempt)
+    return attempt
@@ -0,0 +1,107 @@
+import contextvars
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connection
+from django.urls import Resolver404, resolve
+
+from accounts.roles import get_membership
+from learning import replicas
+
+# Пакет подзапросов в одном HTTP-запросе: подзапросы вызывают view роутера
+# напрямую, без middleware, с уже аутентифицированным пользователем и уже
+# загруженными ролями. Права и лимиты каждого view проверяются как обычно.
+# Пакет из одних GET читает как обычные GET: каждый подзапрос сам выбирает
+# реплику (replicas.choose_read_alias) и не ставит cookie основной базы.
+
+BATCH_PATH = "/api/batch/"
+
+
+def _subrequest(request, membership, item):
+    url = urlsplit(item["path"])
+    body = b""
+    if item.get("body") is not None:
+        body = json.dumps(item["body"]).encode()
+    environ = {
+        key: value
+        for key, value in request.META.items()
+        if not key.startswith("wsgi.") and key not in ("CONTENT_TYPE", "CONTENT_LENGTH")
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": item["method"],
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.url_scheme": request.scheme,
+        }
+    )
+    sub = WSGIRequest(environ)
+    sub.user = request.user
+    sub.session = getattr(request, "session", None)
+    # DRF берёт пользователя отсюда, минуя аутентификаторы и CSRF —
+    # CSRF и аутентификацию уже прошёл сам пакетный запрос
+    sub._force_auth_user = request.user
+    sub._membership = membership
+    return sub
+
+
+def _execute(request, membership, item, read_only=False):
+    path = urlsplit(item["path"]).path
+    if not path.startswith("/api/") or path == BATCH_PATH:
+        return {"status": 400, "body": {"detail": "Недопустимый путь."}}
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return {"status": 404, "body": {"detail": "Не найдено."}}
+
+    sub = _subrequest(request, membership, item)
+    # в пакете с записью чтения идут в основную базу: следующий подзапрос
+    # должен видеть запись предыдущего
+    alias = replicas.choose_read_alias(sub) if read_only else None
+    with replicas.reading_from(alias):
+        response = match.func(sub, *match.args, **match.kwargs)
+        if hasattr(response, "render"):
+            response.render()
+    if response.streaming:
+        return {"status": 400, "body": {"detail": "Потоковые ответы не поддержаны."}}
+    content = response.content.decode(response.charset)
+    if response.get("Content-Type", "").startswith("application/json"):
+        content = json.loads(content) if content else None
+    return {"status": response.status_code, "body": content}
+
+
+def _execute_in_thread(context, request, membership, item):
+    try:
+        return context.run(_execute, request, membership, item, True)
+    finally:
+        # у потока пула своё соединение с БД
+        connection.close()
+
+
+def run_batch(request, items, parallel=False):
+    """Выполняет подзапросы и возвращает их ответы в том же порядке.
+
+    Параллельно выполняются только пакеты из одних GET: запросы с записью
+    идут по порядку, чтобы следующий видел результат предыдущего.
+    """
+    membership = get_membership(request)
+    read_only = all(item["method"] == "GET" for item in items)
+    if read_only:
+        replicas.mark_read_only(request._request)
+    if not (parallel and read_only):
+        return [_execute(request, membership, item, read_only) for item in items]
+
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(settings.BATCH_MAX_WORKERS) as pool:
+        futures = [
+            pool.submit(_execute_in_thread, context.copy(), request, membership, item)
+            for item in items
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from learning.models import (
+    ChangeCounter,
+    Choice,
+    Group,
+    GroupStudent,
+    Question,
+    Tombstone,
+    Topic,
+)
+
+# Лента изменений каталога (?since=<token>). Каждое изменение темы, вопроса
+# или группы получает следующий номер общего счётчика в change_seq, удаление
+# оставляет Tombstone с номером. Номер и его запись в строку идут в одной
+# транзакции: SQLite держит блокировку записи до COMMIT, поэтому номера
+# становятся видны строго по возрастанию и клиент не пропустит изменение.
+
+COUNTER = "catalog"
+TRACKED = (Topic, Question, Group)
+
+
+def _next_seq():
+    if not ChangeCounter.objects.filter(pk=COUNTER).update(value=F("value") + 1):
+        ChangeCounter.objects.create(name=COUNTER, value=1)
+    return ChangeCounter.objects.values_list("value", flat=True).get(pk=COUNTER)
+
+
+def current_seq():
+    return (
+        ChangeCounter.objects.filter(pk=COUNTER).values_list("value", flat=True).first()
+        or 0
+    )
+
+
+def bump(model, pk):
+    with transaction.atomic():
+        seq = _next_seq()
+        model.objects.filter(pk=pk).update(change_seq=seq)
+    return seq
+
+
+def _saved(sender, instance, **kwargs):
+    instance.change_seq = bump(sender, instance.pk)
+
+
+def _deleted(sender, instance, **kwargs):
+    with transaction.atomic():
+        Tombstone.objects.create(
+            model=sender._meta.label_lower,
+            object_id=instance.pk,
+            change_seq=_next_seq(),
+        )
+
+
+def _choice_changed(sender, instance, **kwargs):
+    # варианты отдаются вместе с вопросом
+    bump(Question, instance.question_id)
+
+
+def _membership_changed(sender, instance, **kwargs):
+    # состав группы отдаётся вместе с группой
+    bump(Group, instance.group_id)
+
+
+def _students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            bump(Group, instance.pk)
+        return
+    # student.groups.add/remove/clear: instance — студент, pk_set — группы
+    if action == "pre_clear":
+        instance._cleared_group_ids = list(
+            GroupStudent.objects.filter(student=instance).values_list(
+                "group_id", flat=True
+            )
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        group_ids = pk_set if action != "post_clear" else instance._cleared_group_ids
+        for group_id in group_ids or ():
+            bump(Group, group_id)
+
+
+def connect_signals():
+    for model in TRACKED:
+        post_save.connect(_saved, sender=model)
+        post_delete.connect(_deleted, sender=model)
+    post_save.connect(_choice_changed, sender=Choice)
+    post_delete.connect(_choice_changed, sender=Choice)
+    post_save.connect(_membership_changed, sender=GroupStudent)
+    post_delete.connect(_membership_changed, sender=GroupStudent)
+    m2m_changed.connect(_students_changed, sender=GroupStudent)
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0)
+
+
+class ChangeFeedMixin:
+    """?since=<token> у списка: изменённые после token строки и удалённые id.
+
+    Ответ содержит token для следующего запроса; has_more — в окне было
+    больше CHANGE_FEED_LIMIT строк, и следующий запрос вернёт продолжение.
+    Строки, которые изменились, но больше не видны пользователю (скрыты
+    scoping или фильтром), отдаются как удалённые.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if "since" not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        params = ChangeFeedQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since = params.validated_data["since"]
+
+        queryset = self.filter_queryset(self.get_queryset())
+        model = queryset.model
+        upto = current_seq()
+        seqs = list(
+            queryset.filter(change_seq__gt=since, change_seq__lte=upto)
+            .order_by("change_seq")
+            .values_list("change_seq", flat=True)[: settings.CHANGE_FEED_LIMIT + 1]
+        )
+        has_more = len(seqs) > settings.CHANGE_FEED_LIMIT
+        if has_more:
+            upto = seqs[settings.CHANGE_FEED_LIMIT - 1]
+
+        window = {"change_seq__gt": since, "change_seq__lte": upto}
+        changed = queryset.filter(**window).order_by("change_seq")
+        fast_serializer_class = getattr(self, "fast_serializer_class", None)
+        if fast_serializer_class is not None:
+            fast = fast_serializer_class()
+            results = fast.to_representation(fast.rows(changed))
+        else:
+            results = self.get_serializer(changed, many=True).data
+
+        deleted = set(
+            Tombstone.objects.filter(
+                model=model._meta.label_lower, **window
+            ).values_list("object_id", flat=True)
+        )
+        deleted.update(
+            model.objects.filter(**window)
+            .exclude(pk__in=queryset.filter(**window).values("pk"))
+            .values_list("pk", flat=True)
+        )
+        return Response(
+            {
+                "since": since,
+                "token": upto,
+                "has_more": has_more,
+                "results": results,
+                "deleted": sorted(deleted),
+            }
+        )
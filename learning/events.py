@@ -0,0 +1,107 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from learning.models import (
+    AttemptEvent,
+    EventCheckpoint,
+    Question,
+    QuestionStats,
+    Topic,
+    TopicStats,
+)
+
+STATS_CONSUMER = "stats"
+
+Kind = AttemptEvent.Kind
+
+_TOPIC_COUNTERS = {
+    Kind.STARTED: "attempts_started",
+    Kind.COMPLETED: "attempts_completed",
+    Kind.ABANDONED: "attempts_abandoned",
+}
+
+
+def record(attempt_id, kind, **payload):
+    return AttemptEvent.objects.create(
+        attempt_id=attempt_id, kind=kind, payload=payload
+    )
+
+
+def record_many(events):
+    # events: [(attempt_id, kind, payload), ...]
+    AttemptEvent.objects.bulk_create(
+        AttemptEvent(attempt_id=attempt_id, kind=kind, payload=payload)
+        for attempt_id, kind, payload in events
+    )
+
+
+def consume(batch_size=1000, name=STATS_CONSUMER):
+    """Обрабатывает следующую пачку событий и сдвигает контрольную точку.
+
+    Возвращает число обработанных событий (0 — журнал дочитан).
+    """
+    with transaction.atomic():
+        checkpoint, _ = EventCheckpoint.objects.get_or_create(name=name)
+        events = list(
+            AttemptEvent.objects.filter(pk__gt=checkpoint.last_event_id)
+            .order_by("pk")
+            .values_list("pk", "kind", "payload")[:batch_size]
+        )
+        if not events:
+            return 0
+
+        topic_deltas = {}
+        question_deltas = {}
+        for _, kind, payload in events:
+            if kind in _TOPIC_COUNTERS:
+                topic = topic_deltas.setdefault(payload["topic"], Counter())
+                topic[_TOPIC_COUNTERS[kind]] += 1
+                if kind == Kind.COMPLETED:
+                    topic["score_total"] += payload["score"]
+            elif kind == Kind.ANSWERED:
+                question_deltas.setdefault(payload["question"], Counter())[
+                    "answer_saves"
+                ] += 1
+            elif kind == Kind.GRADED and "previous" in payload:
+                # перепроверка: ответ уже посчитан, меняется только верность,
+                # а с ней и балл попытки
+                topic = topic_deltas.setdefault(payload["topic"], Counter())
+                question = question_deltas.setdefault(payload["question"], Counter())
+                delta = 1 if payload["is_correct"] else -1
+                topic["answers_correct"] += delta
+                topic["score_total"] += delta
+                question["correct"] += delta
+            elif kind == Kind.GRADED:
+                topic = topic_deltas.setdefault(payload["topic"], Counter())
+                question = question_deltas.setdefault(payload["question"], Counter())
+                topic["answers_graded"] += 1
+                question["graded"] += 1
+                if payload["is_correct"]:
+                    topic["answers_correct"] += 1
+                    question["correct"] += 1
+
+        _apply(TopicStats, Topic, "topic_id", topic_deltas)
+        _apply(QuestionStats, Question, "question_id", question_deltas)
+
+        checkpoint.last_event_id = events[-1][0]
+        checkpoint.save(update_fields=["last_event_id", "updated_at"])
+    return len(events)
+
+
+def _apply(model, related_model, key, deltas):
+    # события удалённых тем/вопросов пропускаем
+    existing = set(
+        related_model.objects.filter(pk__in=deltas).values_list("pk", flat=True)
+    )
+    if not existing:
+        return
+    model.objects.bulk_create(
+        [model(**{key: pk}) for pk in existing], ignore_conflicts=True
+    )
+    for pk in existing:
+        counter = deltas[pk]
+        model.objects.filter(**{key: pk}).update(
+            **{field: F(field) + value for field, value in counter.items()}
+        )
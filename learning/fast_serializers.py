@@ -0,0 +1,52 @@
+from rest_framework.response import Response
+
+
+class ValuesSerializer:
+    """Быстрый сериализатор списков: кортежи из values_list() сразу в dict.
+
+    fields — ключи ответа в порядке полей ModelSerializer, sources — lookup
+    для ключей, которые не совпадают с именем поля; many_fields — M2M-поля:
+    ключ -> (модель связи, поле родителя, поле значения), каждое добирается
+    одним запросом на страницу.
+    """
+
+    fields = ()
+    sources = {}
+    many_fields = {}
+
+    def rows(self, queryset):
+        return queryset.prefetch_related(None).values_list(
+            *(self.sources.get(name, name) for name in self.fields)
+        )
+
+    def to_representation(self, rows):
+        keys = self.fields
+        data = [dict(zip(keys, row)) for row in rows]
+        for name, (through, parent_field, value_field) in self.many_fields.items():
+            related = {}
+            parent_ids = [item["id"] for item in data]
+            for parent_id, value in (
+                through.objects.filter(**{f"{parent_field}__in": parent_ids})
+                .order_by(parent_field, value_field)
+                .values_list(parent_field, value_field)
+            ):
+                related.setdefault(parent_id, []).append(value)
+            for item in data:
+                item[name] = related.get(item["id"], [])
+        return data
+
+
+class FastListMixin:
+    # включается во viewset заданием fast_serializer_class
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        fast = self.fast_serializer_class()
+        queryset = fast.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.to_representation(page))
+        return Response(fast.to_representation(queryset))
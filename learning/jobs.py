@@ -0,0 +1,312 @@
+import csv
+import logging
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from learning import events, leaderboards, reviews, snapshots
+from learning.attempts import grade_attempt
+from learning.models import (
+    Attempt,
+    AttemptEvent,
+    AttemptQuestion,
+    Choice,
+    EventCheckpoint,
+    GroupStudent,
+    Job,
+    QuestionSnapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+# Тип задачи -> (обработчик, число попыток). Обработчик получает Job и
+# params как именованные аргументы и возвращает JSON-результат.
+HANDLERS = {}
+
+ACTIVE_STATUSES = (Job.Status.QUEUED, Job.Status.RUNNING)
+
+
+def register(kind, max_attempts=3):
+    def decorator(func):
+        HANDLERS[kind] = (func, max_attempts)
+        return func
+
+    return decorator
+
+
+def _active(dedupe_key):
+    return Job.objects.filter(dedupe_key=dedupe_key, status__in=ACTIVE_STATUSES).first()
+
+
+def enqueue(kind, params=None, *, priority=0, dedupe_key=None, user=None):
+    """Ставит задачу в очередь и возвращает (job, created).
+
+    Если задача с тем же dedupe_key ещё не завершена, новая не создаётся —
+    возвращается существующая.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Неизвестный тип задачи: {kind}")
+    if dedupe_key and (job := _active(dedupe_key)):
+        return job, False
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                kind=kind,
+                params=params or {},
+                priority=priority,
+                dedupe_key=dedupe_key,
+                max_attempts=HANDLERS[kind][1],
+                created_by=user,
+            )
+    except IntegrityError:
+        # ключ успел занять параллельный enqueue (uq_job_active_dedupe)
+        return _active(dedupe_key), False
+    return job, True
+
+
+def claim(worker_id):
+    """Забирает следующую задачу: сначала по приоритету, затем по времени."""
+    while True:
+        now = timezone.now()
+        candidate = (
+            Job.objects.filter(
+                status=Job.Status.QUEUED, run_after__lte=now, kind__in=HANDLERS
+            )
+            .order_by("-priority", "run_after", "id")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        # задачу мог забрать другой воркер между SELECT и UPDATE
+        claimed = Job.objects.filter(pk=candidate, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            started_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate)
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, не продлевавших аренду."""
+    expired = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS),
+    )
+    requeued = expired.filter(attempts__lt=F("max_attempts")).update(
+        status=Job.Status.QUEUED, locked_by="", locked_at=None
+    )
+    expired.update(
+        status=Job.Status.FAILED,
+        error="Воркер не отвечал дольше JOB_LEASE_SECONDS.",
+        finished_at=timezone.now(),
+    )
+    return requeued
+
+
+def report_progress(job, done, total, message=""):
+    # заодно продлевает аренду задачи
+    job.progress = min(100, done * 100 // total) if total else 0
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        progress=job.progress,
+        progress_message=message[:200],
+        locked_at=timezone.now(),
+    )
+
+
+def run(job):
+    func, _ = HANDLERS[job.kind]
+    mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        result = func(job, **job.params)
+    except Exception as exc:
+        logger.exception("job %s (%s) failed", job.pk, job.kind)
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1)
+            mine.update(
+                status=Job.Status.QUEUED,
+                run_after=timezone.now() + timedelta(seconds=delay),
+                error=repr(exc),
+                locked_by="",
+                locked_at=None,
+            )
+        else:
+            mine.update(
+                status=Job.Status.FAILED, error=repr(exc), finished_at=timezone.now()
+            )
+        return False
+    mine.update(
+        status=Job.Status.SUCCEEDED,
+        result=result,
+        progress=100,
+        error="",
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def export_dir():
+    path = Path(settings.JOB_EXPORT_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+# --- задачи -------------------------------------------------------------
+
+
+@register("rebuild_leaderboards")
+def rebuild_leaderboards(job):
+    leaderboards.rebuild()
+    return {}
+
+
+@register("rebuild_stats")
+def rebuild_stats(job, batch_size=1000):
+    # дочитывает журнал событий в таблицы статистики
+    checkpoint = EventCheckpoint.objects.filter(name=events.STATS_CONSUMER).first()
+    total = AttemptEvent.objects.filter(
+        pk__gt=checkpoint.last_event_id if checkpoint else 0
+    ).count()
+    done = 0
+    while processed := events.consume(batch_size):
+        done += processed
+        report_progress(job, done, total, f"{done} событий")
+    return {"events": done}
+
+
+@register("regrade")
+def regrade(job, question):
+    """Перепроверяет завершённые попытки по текущему ключу вопроса.
+
+    В выданных слепках заменяется только список верных вариантов: текст и
+    варианты остаются теми, что видел студент.
+    """
+    correct = set(
+        Choice.objects.filter(question_id=question, is_correct=True).values_list(
+            "pk", flat=True
+        )
+    )
+    replaced = {}
+    for snapshot in QuestionSnapshot.objects.filter(
+        pk__in=AttemptQuestion.objects.filter(question_id=question).values(
+            "snapshot_id"
+        )
+    ):
+        data = dict(snapshot.data)
+        data["correct"] = [
+            choice["id"] for choice in data["choices"] if choice["id"] in correct
+        ]
+        if data["correct"] == snapshot.data["correct"]:
+            continue
+        fixed, _ = QuestionSnapshot.objects.get_or_create(
+            content_hash=snapshots.content_hash(data),
+            defaults={"question_id": question, "data": data},
+        )
+        replaced[snapshot.pk] = fixed.pk
+
+    # каждая завершённая попытка переводится на новый слепок вместе с
+    # перепроверкой: повтор упавшей задачи доделает оставшиеся
+    attempts = list(
+        Attempt.objects.filter(
+            status=Attempt.Status.COMPLETED,
+            attempt_questions__snapshot_id__in=replaced,
+        ).distinct()
+    )
+    changed = 0
+    students = {}
+    for done, attempt in enumerate(attempts, start=1):
+        with transaction.atomic():
+            for old, new in replaced.items():
+                AttemptQuestion.objects.filter(attempt=attempt, snapshot_id=old).update(
+                    snapshot_id=new
+                )
+            score = grade_attempt(attempt)
+            if score != attempt.score:
+                Attempt.objects.filter(pk=attempt.pk).update(score=score)
+                changed += 1
+        students.setdefault(attempt.topic_id, set()).add(attempt.student_id)
+        if done % 100 == 0:
+            report_progress(job, done, len(attempts))
+    for topic_id, student_ids in students.items():
+        leaderboards.refresh(topic_id, student_ids)
+
+    # попытки в процессе проверятся новым ключом при завершении,
+    # брошенные покажут его в разборе
+    with transaction.atomic():
+        for old, new in replaced.items():
+            others = AttemptQuestion.objects.filter(snapshot_id=old)
+            for attempt_id in set(others.values_list("attempt_id", flat=True)):
+                reviews.invalidate(attempt_id)
+            others.update(snapshot_id=new)
+    return {"attempts": len(attempts), "scores_changed": changed}
+
+
+@register("export_gradebook")
+def export_gradebook(job, group, topic):
+    students = list(
+        GroupStudent.objects.filter(group_id=group)
+        .order_by("student__user__username")
+        .values_list("student_id", "student__user__username")
+    )
+    totals = {
+        row["student_id"]: row
+        for row in Attempt.objects.filter(
+            student__group_memberships__group_id=group,
+            topic_id=topic,
+            status=Attempt.Status.COMPLETED,
+        )
+        .values("student_id")
+        .annotate(
+            attempts=Count("id"), best_score=Max("score"), last=Max("finished_at")
+        )
+        .order_by()
+    }
+
+    name = f"gradebook-{job.pk}.csv"
+    with open(export_dir() / name, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["student", "username", "attempts", "best_score", "last"])
+        for done, (student_id, username) in enumerate(students, start=1):
+            row = totals.get(student_id, {})
+            last = row.get("last")
+            writer.writerow(
+                [
+                    student_id,
+                    username,
+                    row.get("attempts", 0),
+                    row.get("best_score", ""),
+                    last.isoformat() if last else "",
+                ]
+            )
+            if done % 500 == 0:
+                report_progress(job, done, len(students))
+    return {"file": name, "rows": len(students)}
+
+
+@register("notify_group")
+def notify_group(job, group, text):
+    # aiohttp нужен только воркеру с уведомлениями
+    from learning.notifications import announce_group
+
+    return dict(announce_group(group, text))
+
+
+@register("notify_results")
+def notify_results(job, batch_size=1000):
+    from learning.notifications import TelegramSender, send_results
+
+    sender = TelegramSender()
+    events_total = 0
+    while True:
+        processed, report = send_results(batch_size, sender)
+        if not processed:
+            return {"events": events_total}
+        events_total += processed
+        report_progress(job, 0, 0, f"{events_total} событий")
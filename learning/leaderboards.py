@@ -0,0 +1,218 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from learning.models import Attempt, GroupStudent, LeaderboardEntry
+
+
+def _board(topic_id, group_id):
+    return LeaderboardEntry.objects.filter(topic_id=topic_id, group_id=group_id)
+
+
+def record_result(attempt):
+    """Обновляет рейтинги темы и групп студента результатом попытки.
+
+    Каждый рейтинг хранит только лучший результат студента; при равных
+    баллах выше тот, кто набрал их раньше.
+    """
+    group_ids = list(
+        GroupStudent.objects.filter(student_id=attempt.student_id).values_list(
+            "group_id", flat=True
+        )
+    )
+    with transaction.atomic():
+        existing = {
+            entry.group_id: entry
+            for entry in LeaderboardEntry.objects.filter(
+                topic_id=attempt.topic_id, student_id=attempt.student_id
+            ).order_by()
+        }
+        new_entries = []
+        improved = []
+        for group_id in [None, *group_ids]:
+            entry = existing.get(group_id)
+            if entry is None:
+                new_entries.append(
+                    LeaderboardEntry(
+                        topic_id=attempt.topic_id,
+                        group_id=group_id,
+                        student_id=attempt.student_id,
+                        score=attempt.score,
+                        finished_at=attempt.finished_at,
+                    )
+                )
+            elif attempt.score > entry.score:
+                entry.score = attempt.score
+                entry.finished_at = attempt.finished_at
+                improved.append(entry)
+        LeaderboardEntry.objects.bulk_create(new_entries)
+        LeaderboardEntry.objects.bulk_update(improved, ["score", "finished_at"])
+
+
+def add_members(pairs):
+    """Копирует лучшие результаты студентов в рейтинги их новых групп.
+
+    pairs: [(group_id, student_id)]. Лучший результат по каждой теме уже
+    лежит в общем рейтинге темы, попытки не перечитываются.
+    """
+    groups_of = {}
+    for group_id, student_id in pairs:
+        groups_of.setdefault(student_id, []).append(group_id)
+    entries = [
+        LeaderboardEntry(
+            topic_id=entry.topic_id,
+            group_id=group_id,
+            student_id=entry.student_id,
+            score=entry.score,
+            finished_at=entry.finished_at,
+        )
+        for entry in LeaderboardEntry.objects.filter(
+            group=None, student_id__in=groups_of
+        ).order_by()
+        for group_id in groups_of[entry.student_id]
+    ]
+    LeaderboardEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def remove_members(pairs):
+    condition = Q()
+    for group_id, student_id in pairs:
+        condition |= Q(group_id=group_id, student_id=student_id)
+    if condition:
+        LeaderboardEntry.objects.filter(condition).delete()
+
+
+def top(topic_id, group_id=None, limit=10):
+    entries = (
+        _board(topic_id, group_id)
+        .select_related("student__user")
+        .order_by("-score", "finished_at", "student_id")[:limit]
+    )
+    return [_row(rank, entry) for rank, entry in enumerate(entries, start=1)]
+
+
+def rank_of(topic_id, student_id, group_id=None):
+    entry = (
+        _board(topic_id, group_id)
+        .select_related("student__user")
+        .filter(student_id=student_id)
+        .first()
+    )
+    if entry is None:
+        return None
+    # место = 1 + число записей, стоящих выше; считается по индексу рейтинга
+    ahead = _board(topic_id, group_id).filter(
+        Q(score__gt=entry.score)
+        | Q(score=entry.score, finished_at__lt=entry.finished_at)
+        | Q(
+            score=entry.score,
+            finished_at=entry.finished_at,
+            student_id__lt=entry.student_id,
+        )
+    )
+    return _row(ahead.count() + 1, entry)
+
+
+def _row(rank, entry):
+    return {
+        "rank": rank,
+        "student": entry.student_id,
+        "username": entry.student.user.username,
+        "score": entry.score,
+        "finished_at": entry.finished_at,
+    }
+
+
+def _entries(attempts, memberships):
+    """Записи рейтингов по лучшим завершённым попыткам студентов."""
+    groups_of = {}
+    for group_id, student_id in memberships.values_list("group_id", "student_id"):
+        groups_of.setdefault(student_id, []).append(group_id)
+
+    best = {}
+    completed = (
+        attempts.filter(status=Attempt.Status.COMPLETED, score__isnull=False)
+        .order_by("-score", "finished_at")
+        .values_list("student_id", "topic_id", "score", "finished_at")
+    )
+    for student_id, topic_id, score, finished_at in completed.iterator():
+        best.setdefault((student_id, topic_id), (score, finished_at))
+
+    return [
+        LeaderboardEntry(
+            topic_id=topic_id,
+            group_id=group_id,
+            student_id=student_id,
+            score=score,
+            finished_at=finished_at,
+        )
+        for (student_id, topic_id), (score, finished_at) in best.items()
+        for group_id in [None, *groups_of.get(student_id, [])]
+    ]
+
+
+def rebuild():
+    entries = _entries(Attempt.objects.all(), GroupStudent.objects.all())
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def refresh(topic_id, student_ids):
+    """Пересчитывает рейтинги темы для студентов по их попыткам.
+
+    record_result только повышает результат; после перепроверки балл
+    может и снизиться.
+    """
+    entries = _entries(
+        Attempt.objects.filter(topic_id=topic_id, student_id__in=student_ids),
+        GroupStudent.objects.filter(student_id__in=student_ids),
+    )
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(
+            topic_id=topic_id, student_id__in=student_ids
+        ).delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def _membership_saved(sender, instance, created, **kwargs):
+    if created:
+        add_members([(instance.group_id, instance.student_id)])
+
+
+def _membership_deleted(sender, instance, **kwargs):
+    remove_members([(instance.group_id, instance.student_id)])
+
+
+def _members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # group.students.add/remove/clear и student.groups.* не вызывают
+    # post_save/post_delete у GroupStudent
+    if action == "pre_clear":
+        owner = "student" if reverse else "group"
+        instance._cleared_memberships = list(
+            GroupStudent.objects.filter(**{owner: instance}).values_list(
+                "group_id", "student_id"
+            )
+        )
+        return
+    if action == "post_clear":
+        remove_members(instance._cleared_memberships)
+        return
+    if action not in ("post_add", "post_remove"):
+        return
+    if reverse:
+        pairs = [(group_id, instance.pk) for group_id in pk_set]
+    else:
+        pairs = [(instance.pk, student_id) for student_id in pk_set]
+    if action == "post_add":
+        add_members(pairs)
+    else:
+        remove_members(pairs)
+
+
+def connect_signals():
+    post_save.connect(_membership_saved, sender=GroupStudent)
+    post_delete.connect(_membership_deleted, sender=GroupStudent)
+    m2m_changed.connect(_members_changed, sender=GroupStudent)
@@ -0,0 +1,41 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class LocalStore:
+    """Служебная таблица в отдельном SQLite-файле на машине.
+
+    Файл общий для всех процессов машины и не конкурирует за блокировку
+    записи с основной БД. Подклассы задают schema и synchronous.
+    """
+
+    schema = ""
+    synchronous = "NORMAL"
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute(self.schema)
+            self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def immediate(self):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
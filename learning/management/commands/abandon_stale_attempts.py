@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from learning import events
+from learning.attempts import flush_pending_answers
+from learning.models import Attempt, AttemptEvent
+
+
+class Command(BaseCommand):
+    help = "Переводит зависшие попытки in_progress в abandoned пачками."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--timeout-minutes",
+            type=int,
+            default=settings.ATTEMPT_ABANDON_TIMEOUT_MINUTES,
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        # пауза между пачками, чтобы студенты успевали писать ответы
+        parser.add_argument("--pause", type=float, default=0.05)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Работать постоянно, повторяя проход каждые --interval секунд.",
+        )
+        parser.add_argument("--interval", type=int, default=60)
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        while True:
+            total, batches = self.sweep(
+                timedelta(minutes=options["timeout_minutes"]),
+                options["batch_size"],
+                options["pause"],
+            )
+            self.stdout.write(f"abandoned={total} batches={batches}")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def sweep(self, timeout, batch_size, pause):
+        cutoff = timezone.now() - timeout
+        stale = Attempt.objects.filter(
+            status=Attempt.Status.IN_PROGRESS, started_at__lt=cutoff
+        ).order_by("started_at")
+
+        total = batches = 0
+        while True:
+            # выбор id идёт вне транзакции: запись держит блокировку SQLite
+            # только на время короткого UPDATE одной пачки
+            ids = list(stale.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            finished_at = timezone.now()
+            with transaction.atomic():
+                # отложенные автосохранением выборы не должны пропасть
+                flush_pending_answers(ids)
+                updated = Attempt.objects.filter(
+                    pk__in=ids, status=Attempt.Status.IN_PROGRESS
+                ).update(status=Attempt.Status.ABANDONED, finished_at=finished_at)
+                # строки, закрытые именно этим UPDATE, узнаём по finished_at
+                events.record_many(
+                    (pk, AttemptEvent.Kind.ABANDONED, {"topic": topic_id})
+                    for pk, topic_id in Attempt.objects.filter(
+                        pk__in=ids,
+                        status=Attempt.Status.ABANDONED,
+                        finished_at=finished_at,
+                    ).values_list("pk", "topic_id")
+                )
+            total += updated
+            batches += 1
+            if self.verbosity > 1:
+                self.stdout.write(f"batch {batches}: {updated}")
+            if len(ids) < batch_size:
+                break
+            time.sleep(pause)
+        return total, batches
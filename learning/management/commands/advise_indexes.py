@@ -0,0 +1,309 @@
+import inspect
+import re
+import traceback
+from collections import defaultdict
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import resolve, reverse
+
+from accounts.models import Student, User
+from config.urls import router
+from learning.attempts import complete_attempt, start_attempt
+from learning.models import Group, Topic
+from learning.seeding import seed
+
+PROJECT_APPS = ("accounts", "learning")
+COLUMN_RE = r'"{table}"\."(\w+)"\s*(=|IN\b|IS\b|<=|>=|<|>|LIKE\b)'
+ORDER_RE = r"ORDER BY (.+?)(?: LIMIT| OFFSET|$)"
+WHERE_RE = r" WHERE (.+?)(?: GROUP BY| ORDER BY| LIMIT|$)"
+# Общий код, через который проходят все запросы: middleware и миксины
+# списков. Их кадры не говорят, какой view выпустил запрос.
+INFRASTRUCTURE = (
+    "learning/replicas.py",
+    "learning/streaming.py",
+    "learning/fast_serializers.py",
+    "learning/changefeed.py",
+    "learning/pagination.py",
+    "learning/batch.py",
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет все API-эндпоинты и списки админки на синтетических данных, "
+        "снимает EXPLAIN QUERY PLAN каждого запроса и предлагает Meta.indexes. "
+        "Данные создаются во временной транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=2000)
+        parser.add_argument("--attempts", type=int, default=50)
+
+    def handle(self, *args, **options):
+        self.tables = {
+            model._meta.db_table: model
+            for model in apps.get_models()
+            if model._meta.app_label in PROJECT_APPS
+        }
+        self.base_dir = str(Path(settings.BASE_DIR))
+        self.this_file = __file__
+        self.findings = defaultdict(set)
+        self.suggestions = defaultdict(set)
+        try:
+            with transaction.atomic():
+                users = self.seed(options)
+                self.exercise(users)
+                raise Rollback
+        except Rollback:
+            pass
+        self.report()
+
+    def seed(self, options):
+        created = seed(students=options["students"], prefix="advise")
+        topic = Topic.objects.filter(title__startswith="advise-").first()
+        students = Student.objects.filter(
+            group_memberships__group=created["groups"][0]
+        ).select_related("user")[: options["attempts"]]
+        # сервисные функции попыток вызываются не через GET — снимаем и их
+        for student in students:
+            attempt = self.capture(
+                "service start_attempt", start_attempt, student.pk, topic
+            )
+            self.capture("service complete_attempt", complete_attempt, attempt)
+        return {
+            "staff": User.objects.create(
+                username="advise-admin", is_staff=True, is_superuser=True
+            ),
+            "teacher": created["teachers"][0].user,
+            "student": students[0].user,
+        }
+
+    # --- прогон эндпоинтов -------------------------------------------------
+
+    def exercise(self, users):
+        topic = Topic.objects.filter(title__startswith="advise-").first()
+        group = Group.objects.filter(name__startswith="advise-").first()
+        detail_ids = {"topic": topic.pk, "group": group.pk}
+
+        for role, user in users.items():
+            client = Client(SERVER_NAME="localhost")
+            client.force_login(user)
+            for prefix, viewset, basename in router.registry:
+                self.get(client, f"{role} {basename}-list", f"/api/{prefix}/")
+                pk = detail_ids.get(prefix)
+                if pk is None:
+                    continue
+                self.get(client, f"{role} {basename}-detail", f"/api/{prefix}/{pk}/")
+                for extra in viewset.get_extra_actions():
+                    if "get" in extra.mapping and extra.detail:
+                        self.get(
+                            client,
+                            f"{role} {basename}-{extra.url_path}",
+                            f"/api/{prefix}/{pk}/{extra.url_path}/",
+                            {"topic": topic.pk},
+                        )
+
+        client = Client(SERVER_NAME="localhost")
+        client.force_login(users["staff"])
+        for model in admin.site._registry:
+            opts = model._meta
+            url = reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+            self.get(client, f"admin {opts.label}", url)
+
+    def get(self, client, label, url, params=None):
+        self.capture(label, client.get, url, params or {}, view=self.view_of(url))
+
+    def capture(self, label, func, *args, view=None):
+        captured = []
+
+        def wrapper(execute, sql, sql_params, many, context):
+            captured.append((sql, sql_params, self.origin()))
+            return execute(sql, sql_params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            result = func(*args)
+        for sql, sql_params, frame in captured:
+            if sql.lstrip().upper().startswith("SELECT"):
+                if view is None:
+                    origin = frame or "?"
+                else:
+                    # без кадра из кода view запрос выпустил queryset,
+                    # который view отдал общему коду списков
+                    name, queryset = view
+                    origin = f"{name} ({frame or queryset})"
+                self.explain(label, sql, sql_params, origin)
+        return result
+
+    def origin(self):
+        # ближайший кадр из кода проекта, кроме middleware и миксинов списков
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            path = self.project_path(frame.filename)
+            if (
+                path
+                and path not in INFRASTRUCTURE
+                and frame.filename != self.this_file
+                and "management" not in path
+                and path != "manage.py"
+            ):
+                return f"{path}:{frame.lineno} {frame.name}"
+        return None
+
+    def project_path(self, filename):
+        if not filename.startswith(self.base_dir) or "site-packages" in filename:
+            return None
+        return Path(filename).relative_to(self.base_dir).as_posix()
+
+    def view_of(self, url):
+        """View по URL и место, где он строит queryset (get_queryset)."""
+        func = resolve(url).func
+        model_admin = getattr(func, "model_admin", None)
+        if model_admin is not None:
+            owner = type(model_admin)
+            name = f"{owner.__module__}.{owner.__qualname__}"
+        else:
+            owner = func.cls
+            action = next(iter(getattr(func, "actions", {}).values()), "")
+            name = f"{owner.__module__}.{owner.__qualname__}.{action}".rstrip(".")
+        get_queryset = owner.get_queryset
+        path = self.project_path(inspect.getsourcefile(get_queryset))
+        if path:
+            line = inspect.getsourcelines(get_queryset)[1]
+            return name, f"{path}:{line} get_queryset"
+        # get_queryset не переопределён — запрос строит атрибут queryset
+        path = self.project_path(inspect.getsourcefile(owner))
+        lines, start = inspect.getsourcelines(owner)
+        for offset, line in enumerate(lines):
+            if path and line.strip().startswith("queryset ="):
+                return name, f"{path}:{start + offset} queryset"
+        return name, f"{owner.__qualname__}.get_queryset (унаследован)"
+
+    # --- разбор планов -----------------------------------------------------
+
+    def explain(self, label, sql, sql_params, origin):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, sql_params)
+            plan = [row[-1] for row in cursor.fetchall()]
+
+        for step in plan:
+            scan = re.match(r"SCAN (\w+)(?: AS \w+)?$", step)
+            search = re.match(r"SEARCH (\w+) USING INDEX (\w+)", step)
+            if scan and scan.group(1) in self.tables:
+                table = scan.group(1)
+                # полный проход без условий на таблицу (COUNT(*), список
+                # без фильтра по первичному ключу) индексом не исправить
+                if self.suggest(table, sql):
+                    self.add("full scan", table, label, origin, sql)
+            elif "USE TEMP B-TREE" in step:
+                self.add(step.lower(), self.main_table(sql), label, origin, sql)
+                self.suggest(self.main_table(sql), sql)
+            elif (
+                search
+                and search.group(1) in self.tables
+                # уникальные индексы отдают не больше строки — не интересно
+                and not search.group(2).startswith("sqlite_autoindex")
+            ):
+                self.add(
+                    f"non-covering index {search.group(2)}",
+                    search.group(1),
+                    label,
+                    origin,
+                    sql,
+                )
+
+    def main_table(self, sql):
+        match = re.search(r'FROM "(\w+)"', sql)
+        return match.group(1) if match else "?"
+
+    def add(self, issue, table, label, origin, sql):
+        self.findings[(issue, table)].add((label, origin, sql[:160]))
+
+    def suggest(self, table, sql):
+        model = self.tables.get(table)
+        if model is None:
+            return
+        concrete = model._meta.concrete_fields
+        columns = {field.column: field.name for field in concrete}
+        relations = {field.name for field in concrete if field.is_relation}
+        equality, ranges = [], []
+        where = re.search(WHERE_RE, sql)
+        for column, op in re.findall(
+            COLUMN_RE.format(table=table), where.group(1) if where else ""
+        ):
+            if column not in columns:
+                continue
+            target = equality if op in ("=", "IN", "IS") else ranges
+            if columns[column] not in equality + ranges:
+                target.append(columns[column])
+        # сначала внешние ключи: они селективнее булевых флагов
+        equality.sort(key=lambda name: name not in relations)
+        order = re.search(ORDER_RE, sql)
+        if order:
+            for column, direction in re.findall(
+                rf'"{table}"\."(\w+)" (ASC|DESC)', order.group(1)
+            ):
+                name = columns.get(column)
+                if name and name not in equality + ranges:
+                    ranges.append(f"-{name}" if direction == "DESC" else name)
+        # id в хвосте — лишь разрешение равенства, он и так есть в каждом индексе
+        fields = tuple(name for name in equality + ranges if name not in ("id", "-id"))
+        if fields:
+            self.suggestions[model].add(fields)
+        return bool(fields)
+
+    # --- отчёт -------------------------------------------------------------
+
+    def report(self):
+        for (issue, table), hits in sorted(self.findings.items()):
+            self.stdout.write(self.style.WARNING(f"{issue}: {table}"))
+            for label, origin, sql in sorted(hits)[:10]:
+                self.stdout.write(f"    {label} <- {origin}")
+                self.stdout.write(f"        {sql}")
+            if len(hits) > 10:
+                self.stdout.write(f"    ... ещё {len(hits) - 10}")
+
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS("Предлагаемые Meta.indexes:"))
+        for model, candidates in sorted(
+            self.suggestions.items(), key=lambda item: item[0]._meta.label
+        ):
+            existing = self.existing_indexes(model)
+            fresh = [
+                fields
+                for fields in sorted(candidates)
+                if not any(
+                    have[: len(fields)] == self.plain(fields) for have in existing
+                )
+            ]
+            if not fresh:
+                continue
+            self.stdout.write(f"{model._meta.label} ({model.__module__}):")
+            for fields in fresh:
+                self.stdout.write(f"    models.Index(fields={list(fields)!r}),")
+
+    def plain(self, fields):
+        # направление не важно: SQLite читает индекс в обе стороны
+        return tuple(name.lstrip("-") for name in fields)
+
+    def existing_indexes(self, model):
+        existing = {self.plain(index.fields) for index in model._meta.indexes}
+        existing |= {
+            self.plain(constraint.fields)
+            for constraint in model._meta.constraints
+            if getattr(constraint, "fields", None) and not constraint.condition
+        }
+        existing |= {
+            (field.name,)
+            for field in model._meta.concrete_fields
+            if field.db_index or field.unique
+        }
+        return existing
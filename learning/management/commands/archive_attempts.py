@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from learning import archive
+from learning.models import Attempt
+
+
+class Command(BaseCommand):
+    help = "Переносит старые завершённые и брошенные попытки в сжатый архив."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.ATTEMPT_RETENTION_DAYS)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.1)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        old = Attempt.objects.filter(
+            status__in=archive.ARCHIVABLE_STATUSES, started_at__lt=cutoff
+        ).order_by("started_at")
+
+        total = files = 0
+        while ids := list(old.values_list("pk", flat=True)[: options["batch_size"]]):
+            total += archive.archive_batch(ids)
+            files += 1
+            time.sleep(options["pause"])
+        self.stdout.write(f"archived={total} files={files}")
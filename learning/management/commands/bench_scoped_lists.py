@@ -0,0 +1,103 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import Student
+from accounts.views import StudentViewSet, UserViewSet
+from learning.seeding import seed
+from learning.views import AttemptViewSet, GroupViewSet
+
+VIEWSETS = {
+    "student": StudentViewSet,
+    "user": UserViewSet,
+    "group": GroupViewSet,
+    "attempt": AttemptViewSet,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Меряет время ограниченных по роли списков при росте общего числа "
+        "студентов (размер группы фиксирован). Данные откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+        parser.add_argument("--group-size", type=int, default=30)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--explain", action="store_true", help="Показать план запроса списка."
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("students " + " ".join(f"{name:>18}" for name in VIEWSETS))
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    self.run(size, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, size, options):
+        created = seed(
+            students=size,
+            groups=max(1, size // options["group_size"]),
+            topics=1,
+            questions_per_topic=1,
+            prefix="scope",
+        )
+        factory = APIRequestFactory(SERVER_NAME="localhost")
+        users = {
+            "teacher": created["teachers"][0].user,
+            "student": Student.objects.filter(
+                group_memberships__group=created["groups"][0]
+            )
+            .select_related("user")
+            .first()
+            .user,
+        }
+
+        cells = []
+        for name, viewset in VIEWSETS.items():
+            view = viewset.as_view({"get": "list"})
+            timings = []
+            for role, user in users.items():
+
+                def call():
+                    request = factory.get(f"/api/{name}/")
+                    force_authenticate(request, user=user)
+                    return view(request).render()
+
+                timings.append(self.measure(call, options["repeat"]))
+                if options["explain"] and role == "teacher":
+                    self.explain(name, call)
+            cells.append("/".join(f"{value:.2f}" for value in timings) + "ms")
+        self.stdout.write(f"{size:8} " + " ".join(f"{cell:>18}" for cell in cells))
+
+    def measure(self, call, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def explain(self, name, call):
+        with CaptureQueriesContext(connection) as captured:
+            call()
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                if "LIMIT" not in query["sql"]:
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+                for row in cursor.fetchall():
+                    self.stdout.write(f"    {name}: {row[-1]}")
@@ -0,0 +1,83 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from accounts.views import StudentViewSet, TeacherViewSet
+from learning.seeding import seed
+from learning.views import GroupViewSet, TopicViewSet
+
+VIEWSETS = {
+    "topic": TopicViewSet,
+    "group": GroupViewSet,
+    "student": StudentViewSet,
+    "teacher": TeacherViewSet,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Меряет время быстрого (values_list) и обычного пути сериализации "
+        "списков. Совпадение ответов проверяет FastSerializerTests. "
+        "Данные создаются во временной транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=200)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--students", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                seed(
+                    students=options["students"],
+                    groups=options["page_size"],
+                    topics=options["page_size"],
+                    questions_per_topic=1,
+                    prefix="bench",
+                )
+                self.run(options["page_size"], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, page_size, repeat):
+        user = User.objects.create(username="bench-staff", is_staff=True)
+        factory = APIRequestFactory(SERVER_NAME="localhost")
+        for name, viewset in VIEWSETS.items():
+            view = viewset.as_view({"get": "list"})
+
+            def call():
+                request = factory.get(f"/api/{name}/", {"page_size": page_size})
+                force_authenticate(request, user=user)
+                return view(request).render().content
+
+            fast_class = viewset.fast_serializer_class
+            try:
+                fast_times = self.measure(call, repeat)
+                viewset.fast_serializer_class = None
+                slow_times = self.measure(call, repeat)
+            finally:
+                viewset.fast_serializer_class = fast_class
+
+            self.stdout.write(
+                f"{name:8} serializer={slow_times:8.2f}ms "
+                f"values={fast_times:8.2f}ms "
+                f"x{slow_times / fast_times:5.2f}"
+            )
+
+    def measure(self, call, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from learning import events
+
+
+class Command(BaseCommand):
+    help = "Читает журнал событий попыток и обновляет таблицы статистики."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--loop", action="store_true")
+        parser.add_argument("--interval", type=int, default=5)
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while processed := events.consume(options["batch_size"]):
+                total += processed
+            self.stdout.write(f"events={total}")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from learning.notifications import TelegramSender, announce_group, send_results
+
+
+class Command(BaseCommand):
+    help = (
+        "Telegram-уведомления: результаты завершённых попыток из журнала событий "
+        "(--results) или объявление группе (--group и --text)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--results", action="store_true")
+        parser.add_argument("--group", type=int)
+        parser.add_argument("--text")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--loop", action="store_true")
+        parser.add_argument("--interval", type=int, default=5)
+        parser.add_argument(
+            "--api-base", help="Адрес Bot API, например локальной заглушки."
+        )
+        parser.add_argument("--concurrency", type=int)
+
+    def handle(self, *args, **options):
+        if not settings.TELEGRAM_BOT_TOKEN:
+            raise CommandError("TELEGRAM_BOT_TOKEN не задан.")
+        sender = TelegramSender(
+            api_base=options["api_base"], concurrency=options["concurrency"]
+        )
+
+        if options["group"] is not None:
+            if not options["text"]:
+                raise CommandError("Для объявления нужен --text.")
+            report = announce_group(options["group"], options["text"], sender)
+            self.stdout.write(self.format(report))
+            return
+        if not options["results"]:
+            raise CommandError("Укажите --results или --group.")
+
+        while True:
+            while True:
+                processed, report = send_results(options["batch_size"], sender)
+                if not processed:
+                    break
+                self.stdout.write(f"events={processed} " + self.format(report))
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def format(self, report):
+        return " ".join(
+            f"{key}={report[key]}" for key in ("sent", "rejected", "failed", "retries")
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from learning import leaderboards
+
+
+class Command(BaseCommand):
+    help = "Пересобирает рейтинги групп и тем по завершённым попыткам."
+
+    def handle(self, *args, **options):
+        count = leaderboards.rebuild()
+        self.stdout.write(f"entries={count}")
@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from learning import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Пишет пульс ReplicaHeartbeat в основную базу раз в "
+        "REPLICA_HEARTBEAT_SECONDS. Без этого процесса пульс стареет, и "
+        "отчёты читаются из основной базы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true")
+
+    def handle(self, *args, **options):
+        while True:
+            replicas.beat()
+            if options["once"]:
+                return
+            time.sleep(settings.REPLICA_HEARTBEAT_SECONDS)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from learning import archive
+from learning.models import ArchivedAttempt
+
+
+class Command(BaseCommand):
+    help = "Возвращает попытки из архива в рабочие таблицы."
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int)
+        parser.add_argument("--file", help="Восстановить все попытки из файла архива.")
+
+    def handle(self, *args, **options):
+        if not options["ids"] and not options["file"]:
+            raise CommandError("Укажите id попыток или --file.")
+        archived = ArchivedAttempt.objects.all()
+        if options["ids"]:
+            archived = archived.filter(pk__in=options["ids"])
+        if options["file"]:
+            archived = archived.filter(archive_file=options["file"])
+        restored, skipped = archive.restore(archived)
+        self.stdout.write(f"restored={restored} skipped={skipped}")
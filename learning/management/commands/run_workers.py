@@ -0,0 +1,58 @@
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from learning import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет фоновые задачи из таблицы Job пулом потоков: по приоритету, "
+        "с повторами и возвратом зависших задач в очередь."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=settings.JOB_WORKER_THREADS)
+        parser.add_argument("--poll", type=float, default=1.0)
+        parser.add_argument(
+            "--once", action="store_true", help="Завершиться, когда очередь пуста."
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            futures = [
+                pool.submit(self.loop, f"{prefix}:{number}", options)
+                for number in range(options["threads"])
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                # текущие задачи дорабатывают, новые не берутся
+                self.stop.set()
+
+    def loop(self, worker_id, options):
+        try:
+            while not self.stop.is_set():
+                job = jobs.claim(worker_id)
+                if job is None:
+                    jobs.requeue_stale()
+                    if options["once"]:
+                        return
+                    self.stop.wait(options["poll"])
+                    continue
+                ok = jobs.run(job)
+                self.stdout.write(
+                    f"{worker_id} job={job.pk} {job.kind} "
+                    + ("ok" if ok else f"error attempt={job.attempts}")
+                )
+        finally:
+            # у каждого потока своё соединение с БД
+            connection.close()
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_remove_user_role_student_teacher'),
+        ('learning', '0005_groupstudent_group_students_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['status', 'started_at'], name='learning_at_status_220224_idx'),
+        ),
+    ]
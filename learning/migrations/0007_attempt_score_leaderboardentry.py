@@ -0,0 +1,36 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_remove_user_role_student_teacher'),
+        ('learning', '0006_attempt_status_started_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attempt',
+            name='score',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField()),
+                ('finished_at', models.DateTimeField()),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='learning.group')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='accounts.student')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='learning.topic')),
+            ],
+            options={
+                'ordering': ['-score', 'finished_at', 'student'],
+                'indexes': [models.Index(fields=['topic', 'group', '-score', 'finished_at', 'student'], name='leaderboard_rank_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('group__isnull', False)), fields=('topic', 'group', 'student'), name='uq_leaderboard_group_student'), models.UniqueConstraint(condition=models.Q(('group__isnull', True)), fields=('topic', 'student'), name='uq_leaderboard_topic_student')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0007_attempt_score_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='learning.question')),
+                ('answer_saves', models.PositiveIntegerField(default=0)),
+                ('graded', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TopicStats',
+            fields=[
+                ('topic', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='learning.topic')),
+                ('attempts_started', models.PositiveIntegerField(default=0)),
+                ('attempts_completed', models.PositiveIntegerField(default=0)),
+                ('attempts_abandoned', models.PositiveIntegerField(default=0)),
+                ('answers_graded', models.PositiveIntegerField(default=0)),
+                ('answers_correct', models.PositiveIntegerField(default=0)),
+                ('score_total', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttemptEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('started', 'Started'), ('answered', 'Answered'), ('graded', 'Graded'), ('completed', 'Completed'), ('abandoned', 'Abandoned')], max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempt', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='learning.attempt')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
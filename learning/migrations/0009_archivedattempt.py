@@ -0,0 +1,35 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_remove_user_role_student_teacher'),
+        ('learning', '0008_attempt_events_and_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAttempt',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('in_progress', 'In progress'), ('completed', 'Completed'), ('abandoned', 'Abandoned')], max_length=20)),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('score', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('question_count', models.PositiveSmallIntegerField(default=0)),
+                ('archive_file', models.CharField(max_length=255)),
+                ('archive_line', models.PositiveIntegerField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attempts', to='accounts.student')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_attempts', to='learning.topic')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['student', 'started_at'], name='learning_ar_student_63c563_idx'), models.Index(fields=['topic', 'started_at'], name='learning_ar_topic_i_016559_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_remove_user_role_student_teacher"),
+        ("learning", "0009_archivedattempt"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="groupstudent",
+            index=models.Index(
+                fields=["student", "group"], name="learning_gr_student_12b33a_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_remove_user_role_student_teacher"),
+        ("learning", "0010_groupstudent_student_group_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="choice",
+            index=models.Index(
+                fields=["question", "is_correct"], name="learning_ch_questio_93353d_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaderboardentry",
+            index=models.Index(
+                fields=["student", "topic"], name="learning_le_student_b193b4_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                fields=["topic", "is_active"], name="learning_qu_topic_i_fde409_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from learning.snapshots import freeze
+
+
+def backfill_snapshots(apps, schema_editor):
+    # для уже выданных вопросов доступно только текущее состояние вопроса
+    AttemptQuestion = apps.get_model("learning", "AttemptQuestion")
+    question_ids = list(
+        AttemptQuestion.objects.filter(snapshot__isnull=True)
+        .order_by()
+        .values_list("question_id", flat=True)
+        .distinct()
+    )
+    for start in range(0, len(question_ids), 500):
+        snapshot_ids = freeze(question_ids[start : start + 500], apps=apps)
+        for question_id, snapshot_id in snapshot_ids.items():
+            AttemptQuestion.objects.filter(
+                question_id=question_id, snapshot__isnull=True
+            ).update(snapshot_id=snapshot_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning", "0011_question_choice_leaderboard_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64, unique=True)),
+                ("data", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "question",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="snapshots",
+                        to="learning.question",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="attemptquestion",
+            name="snapshot",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="attempt_questions",
+                to="learning.questionsnapshot",
+            ),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="attemptquestion",
+            name="snapshot",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="attempt_questions",
+                to="learning.questionsnapshot",
+            ),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:34
+
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # существующие строки получают номера по порядку, счётчик — последний
+    seq = 0
+    for name in ("Topic", "Question", "Group"):
+        model = apps.get_model("learning", name)
+        batch = []
+        for obj in model.objects.order_by("pk").only("pk").iterator():
+            seq += 1
+            obj.change_seq = seq
+            batch.append(obj)
+        model.objects.bulk_update(batch, ["change_seq"], batch_size=1000)
+    apps.get_model("learning", "ChangeCounter").objects.create(
+        name="catalog", value=seq
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning", "0013_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeCounter",
+            fields=[
+                (
+                    "name",
+                    models.CharField(max_length=50, primary_key=True, serialize=False),
+                ),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="group",
+            name="change_seq",
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="change_seq",
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="topic",
+            name="change_seq",
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name="Tombstone",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("model", models.CharField(max_length=100)),
+                ("object_id", models.BigIntegerField()),
+                ("change_seq", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["model", "change_seq"],
+                        name="learning_to_model_ac7bbc_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning", "0014_change_feed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="answer",
+            name="pending_choices",
+            field=models.JSONField(editable=False, null=True),
+        ),
+    ]
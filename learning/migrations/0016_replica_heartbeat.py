@@ -0,0 +1,28 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning", "0015_answer_pending_choices"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReplicaHeartbeat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("beat_at", models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.1.2 on 2026-10-19 07:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Явная промежуточная модель поверх существующей таблицы
+    # learning_answer_selected_choices: меняется только состояние моделей
+    # (PROTECT проверяет Django), схема базы остаётся прежней.
+
+    dependencies = [
+        ("learning", "0016_replica_heartbeat"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="AnswerChoice",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "answer",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="learning.answer",
+                            ),
+                        ),
+                        (
+                            "choice",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.PROTECT,
+                                to="learning.choice",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "learning_answer_selected_choices",
+                        "unique_together": {("answer", "choice")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="answer",
+                    name="selected_choices",
+                    field=models.ManyToManyField(
+                        blank=True,
+                        related_name="answers",
+                        through="learning.AnswerChoice",
+                        to="learning.choice",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.1.2 on 2026-10-19 07:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("learning", "0017_answer_choice"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="answer",
+            name="pending_choices",
+        ),
+    ]
@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class Topic(models.Model):
     title = models.CharField(max_length=200, unique=True)
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    # позиция последнего изменения в ленте ?since= (learning/changefeed.py)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ["title"]
@@ -29,6 +33,12 @@ class Question(models.Model):
 
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # позиция последнего изменения в ленте ?since= (learning/changefeed.py)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+    class Meta:
+        # выдача вопросов в попытку: активные вопросы темы
+        indexes = [models.Index(fields=["topic", "is_active"])]
 
     def clean(self):
         # В админке Question может сохраняться до вариантов — поэтому
@@ -50,6 +60,8 @@ class Choice(models.Model):
 
     class Meta:
         ordering = ["order", "id"]
+        # проверка попытки: правильные варианты выданных вопросов
+        indexes = [models.Index(fields=["question", "is_correct"])]
 
     def __str__(self) -> str:
         return self.text
@@ -74,10 +86,14 @@ class Attempt(models.Model):
         max_length=20, choices=Status.choices, default=Status.IN_PROGRESS
     )
 
+    # число верных ответов, заполняется при завершении попытки
+    score = models.PositiveSmallIntegerField(null=True, blank=True)
+
     class Meta:
         indexes = [
             models.Index(fields=["student", "started_at"]),
             models.Index(fields=["topic", "started_at"]),
+            models.Index(fields=["status", "started_at"]),
         ]
         ordering = ["-started_at"]
 
@@ -88,6 +104,124 @@ class Attempt(models.Model):
         )
 
 
+class ArchivedAttempt(models.Model):
+    # Краткая запись о попытке, перенесённой в архив (archive_attempts).
+    # Полные данные лежат строкой JSON Lines в сжатом файле archive_file.
+    id = models.BigIntegerField(primary_key=True)  # id исходной попытки
+    student = models.ForeignKey(
+        "accounts.Student",
+        on_delete=models.CASCADE,
+        related_name="archived_attempts",
+    )
+    topic = models.ForeignKey(
+        Topic, on_delete=models.PROTECT, related_name="archived_attempts"
+    )
+    status = models.CharField(max_length=20, choices=Attempt.Status.choices)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    score = models.PositiveSmallIntegerField(null=True, blank=True)
+    question_count = models.PositiveSmallIntegerField(default=0)
+
+    archive_file = models.CharField(max_length=255)
+    archive_line = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["student", "started_at"]),
+            models.Index(fields=["topic", "started_at"]),
+        ]
+        ordering = ["-started_at"]
+
+    def __str__(self) -> str:
+        return f"Archived attempt #{self.pk} | {self.status}"
+
+
+class AttemptEvent(models.Model):
+    # Журнал событий попыток (outbox): только добавление, пишется в той же
+    # транзакции, что и изменение Attempt/Answer. Читается командой
+    # consume_attempt_events, аналитика строится по нему, а не по
+    # рабочим таблицам попыток.
+    class Kind(models.TextChoices):
+        STARTED = "started", "Started"
+        ANSWERED = "answered", "Answered"
+        GRADED = "graded", "Graded"
+        COMPLETED = "completed", "Completed"
+        ABANDONED = "abandoned", "Abandoned"
+
+    # без внешнего ключа в БД: журнал переживает удаление/архивацию попытки
+    attempt = models.ForeignKey(
+        Attempt,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="events",
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.kind} attempt #{self.attempt_id}"
+
+
+class EventCheckpoint(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} @ {self.last_event_id}"
+
+
+class TopicStats(models.Model):
+    topic = models.OneToOneField(
+        Topic, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    attempts_started = models.PositiveIntegerField(default=0)
+    attempts_completed = models.PositiveIntegerField(default=0)
+    attempts_abandoned = models.PositiveIntegerField(default=0)
+    answers_graded = models.PositiveIntegerField(default=0)
+    answers_correct = models.PositiveIntegerField(default=0)
+    score_total = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"Stats {self.topic.title}"
+
+
+class QuestionStats(models.Model):
+    question = models.OneToOneField(
+        Question, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    answer_saves = models.PositiveIntegerField(default=0)
+    graded = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"Stats Q#{self.question_id}"
+
+
+class QuestionSnapshot(models.Model):
+    # Неизменяемый слепок вопроса на момент выдачи: текст, варианты и набор
+    # верных. Одинаковые слепки хранятся один раз (content_hash), поэтому
+    # правка Question/Choice не меняет проверку и разбор старых попыток.
+    content_hash = models.CharField(max_length=64, unique=True)
+    question = models.ForeignKey(
+        Question,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="snapshots",
+    )
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Snapshot Q#{self.question_id} {self.content_hash[:8]}"
+
+
 class AttemptQuestion(models.Model):
     attempt = models.ForeignKey(
         Attempt, on_delete=models.CASCADE, related_name="attempt_questions"
@@ -95,6 +229,9 @@ class AttemptQuestion(models.Model):
     question = models.ForeignKey(
         Question, on_delete=models.PROTECT, related_name="attempt_questions"
     )
+    snapshot = models.ForeignKey(
+        QuestionSnapshot, on_delete=models.PROTECT, related_name="attempt_questions"
+    )
     order = models.PositiveSmallIntegerField()  # 1..10
 
     class Meta:
@@ -119,7 +256,7 @@ class Answer(models.Model):
 
     # выбранные студентом варианты (может быть несколько)
     selected_choices = models.ManyToManyField(
-        "Choice", blank=True, related_name="answers"
+        "Choice", through="AnswerChoice", blank=True, related_name="answers"
     )
 
     answered_at = models.DateTimeField(null=True, blank=True)
@@ -136,6 +273,19 @@ class Answer(models.Model):
         return f"Answer for Attempt #{self.attempt_question.attempt_id} Q{self.attempt_question.order}"
 
 
+class AnswerChoice(models.Model):
+    # Выбор студента. Слепок хранит варианты вопроса, но выбор ссылается на
+    # живые Choice: выбранный хоть раз вариант не удаляется, иначе он молча
+    # пропал бы из разбора и перепроверки старых попыток. Таблица — бывшая
+    # автоматическая таблица selected_choices.
+    answer = models.ForeignKey(Answer, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.PROTECT)
+
+    class Meta:
+        db_table = "learning_answer_selected_choices"
+        unique_together = [("answer", "choice")]
+
+
 class Group(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -149,6 +299,8 @@ class Group(models.Model):
     )
 
     is_active = models.BooleanField(default=True)
+    # позиция последнего изменения в ленте ?since= (learning/changefeed.py)
+    change_seq = models.BigIntegerField(default=0, db_index=True, editable=False)
     students = models.ManyToManyField(
         "accounts.Student",
         through="GroupStudent",
@@ -178,6 +330,154 @@ class GroupStudent(models.Model):
                 fields=["group", "student"], name="uq_group_student"
             )
         ]
+        # обратный порядок для отбора "группы студента" (learning.scoping)
+        indexes = [models.Index(fields=["student", "group"])]
 
     def __str__(self) -> str:
         return f"{self.group.name} | {self.student.user.username}"
+
+
+class LeaderboardEntry(models.Model):
+    # Лучший результат студента по теме: в рейтинге группы (group задана)
+    # или в общем рейтинге темы (group = null). Порядок мест задаёт индекс
+    # (score desc, finished_at), поэтому обновление и поиск места — это
+    # операции над B-деревом, а не сортировка всех участников.
+    topic = models.ForeignKey(
+        Topic, on_delete=models.CASCADE, related_name="leaderboard_entries"
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="leaderboard_entries",
+    )
+    student = models.ForeignKey(
+        "accounts.Student",
+        on_delete=models.CASCADE,
+        related_name="leaderboard_entries",
+    )
+    score = models.PositiveSmallIntegerField()
+    finished_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["topic", "group", "student"],
+                condition=models.Q(group__isnull=False),
+                name="uq_leaderboard_group_student",
+            ),
+            models.UniqueConstraint(
+                fields=["topic", "student"],
+                condition=models.Q(group__isnull=True),
+                name="uq_leaderboard_topic_student",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["topic", "group", "-score", "finished_at", "student"],
+                name="leaderboard_rank_idx",
+            ),
+            # все рейтинги студента по теме (record_result)
+            models.Index(fields=["student", "topic"]),
+        ]
+        ordering = ["-score", "finished_at", "student"]
+
+    def __str__(self) -> str:
+        board = self.group.name if self.group_id else "all"
+        return f"{self.topic.title} | {board} | {self.student} | {self.score}"
+
+
+class Job(models.Model):
+    # Фоновая задача (learning/jobs.py): очередь в БД, выполняется командой
+    # run_workers. Воркер забирает задачу условным UPDATE по статусу и
+    # продлевает аренду (locked_at) при каждом отчёте о прогрессе.
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    # больше — раньше
+    priority = models.SmallIntegerField(default=0)
+    # пока задача с этим ключом в очереди или выполняется, новая не ставится
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    progress = models.PositiveSmallIntegerField(default=0)  # 0..100
+    progress_message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="uq_job_active_dedupe",
+            ),
+        ]
+        indexes = [
+            # выбор следующей задачи воркером
+            models.Index(
+                fields=["status", "-priority", "run_after", "id"],
+                name="job_queue_idx",
+            ),
+            models.Index(fields=["created_by", "-created_at"]),
+        ]
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.kind} {self.status}"
+
+
+class ChangeCounter(models.Model):
+    # Общий счётчик ленты изменений каталога; строка создаётся миграцией
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.name}={self.value}"
+
+
+class Tombstone(models.Model):
+    # Отметка об удалении строки для ленты ?since=
+    model = models.CharField(max_length=100)  # app_label.model_name
+    object_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["model", "change_seq"])]
+
+    def __str__(self) -> str:
+        return f"{self.model}#{self.object_id} @{self.change_seq}"
+
+
+class ReplicaHeartbeat(models.Model):
+    # Одна строка: время последнего пульса основной базы. По её копии на
+    # реплике меряется отставание (learning/replicas.py)
+    beat_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return self.beat_at.isoformat()
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+
+import aiohttp
+from django.conf import settings
+from django.db.models import Count
+
+from accounts.models import Student
+from learning.models import Attempt, AttemptEvent, EventCheckpoint, GroupStudent, Topic
+from learning.throttling import parse_rate
+
+logger = logging.getLogger(__name__)
+
+RESULTS_CONSUMER = "telegram"
+
+# Рассылка идёт вне обработчика запроса (команда notify_telegram): получатели
+# читаются из БД одним запросом, затем сообщения уходят в Bot API через общий
+# пул из TELEGRAM_CONCURRENCY задач с общим ограничением скорости.
+
+
+class RateLimiter:
+    """Выпускает запросы равномерно, не чаще rate в секунду на все задачи."""
+
+    def __init__(self, per_second):
+        self.interval = 1 / per_second
+        self.next_at = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        delay = self.next_at - now
+        self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        # 429 от Bot API: все задачи ждут retry_after
+        self.next_at = max(self.next_at, time.monotonic() + seconds)
+
+
+class TelegramSender:
+    def __init__(self, token=None, api_base=None, concurrency=None, rate=None):
+        self.token = token or settings.TELEGRAM_BOT_TOKEN
+        self.api_base = (api_base or settings.TELEGRAM_API_BASE).rstrip("/")
+        self.concurrency = concurrency or settings.TELEGRAM_CONCURRENCY
+        self.rate = parse_rate(rate or settings.TELEGRAM_RATE)
+        self.max_retries = settings.TELEGRAM_MAX_RETRIES
+
+    def send(self, messages):
+        """messages: [(chat_id, text)]. Возвращает счётчики sent/rejected/failed."""
+        return asyncio.run(self.send_all(messages))
+
+    async def send_all(self, messages):
+        self.limiter = RateLimiter(self.rate)
+        report = Counter()
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=timeout
+        ) as session:
+            workers = [
+                asyncio.create_task(self.worker(session, queue, report))
+                for _ in range(self.concurrency)
+            ]
+            for message in messages:
+                await queue.put(message)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        return report
+
+    async def worker(self, session, queue, report):
+        while (message := await queue.get()) is not None:
+            report[await self.send_one(session, *message, report)] += 1
+
+    async def send_one(self, session, chat_id, text, report):
+        url = f"{self.api_base}/bot{self.token}/sendMessage"
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                report["retries"] += 1
+            await self.limiter.acquire()
+            # экспоненциальная задержка со случайным разбросом
+            delay = random.uniform(0.5, 1) * min(30, 2**attempt)
+            try:
+                async with session.post(
+                    url, json={"chat_id": chat_id, "text": text}
+                ) as response:
+                    status = response.status
+                    if status < 500:
+                        data = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                # текст исключений aiohttp содержит URL, а в нём токен бота
+                logger.warning("telegram %s: %s", chat_id, type(exc).__name__)
+                await asyncio.sleep(delay)
+                continue
+            if status >= 500:
+                logger.warning("telegram %s: HTTP %s", chat_id, status)
+                await asyncio.sleep(delay)
+                continue
+
+            if data.get("ok"):
+                return "sent"
+            if status == 429:
+                self.limiter.pause(data.get("parameters", {}).get("retry_after", 1))
+            else:
+                # чат не найден, бот заблокирован — повтор не поможет
+                logger.info("telegram %s: %s", chat_id, data.get("description"))
+                return "rejected"
+        return "failed"
+
+
+def group_chat_ids(group_id):
+    return list(
+        GroupStudent.objects.filter(
+            group_id=group_id, student__telegram_chat_id__isnull=False
+        )
+        .order_by("student_id")
+        .values_list("student__telegram_chat_id", flat=True)
+    )
+
+
+def announce_group(group_id, text, sender=None):
+    sender = sender or TelegramSender()
+    return sender.send([(chat_id, text) for chat_id in group_chat_ids(group_id)])
+
+
+def send_results(batch_size=1000, sender=None):
+    """Рассылает результаты завершённых попыток из журнала событий.
+
+    Контрольная точка сдвигается после отправки: при сбое пачка уйдёт
+    повторно. Возвращает (число событий, счётчики отправки).
+    """
+    checkpoint, _ = EventCheckpoint.objects.get_or_create(name=RESULTS_CONSUMER)
+    events = list(
+        AttemptEvent.objects.filter(
+            pk__gt=checkpoint.last_event_id, kind=AttemptEvent.Kind.COMPLETED
+        )
+        .order_by("pk")
+        .values_list("pk", "attempt_id", "payload")[:batch_size]
+    )
+    if not events:
+        return 0, Counter()
+
+    chat_ids = dict(
+        Student.objects.filter(
+            pk__in={payload["student"] for _, _, payload in events},
+            telegram_chat_id__isnull=False,
+        ).values_list("pk", "telegram_chat_id")
+    )
+    titles = dict(
+        Topic.objects.filter(
+            pk__in={payload["topic"] for _, _, payload in events}
+        ).values_list("pk", "title")
+    )
+    totals = dict(
+        Attempt.objects.filter(pk__in=[attempt_id for _, attempt_id, _ in events])
+        .annotate(total=Count("attempt_questions"))
+        .values_list("pk", "total")
+    )
+
+    messages = []
+    for _, attempt_id, payload in events:
+        chat_id = chat_ids.get(payload["student"])
+        if chat_id is None:
+            continue
+        score = payload["score"]
+        if attempt_id in totals:
+            score = f"{score} из {totals[attempt_id]}"
+        title = titles.get(payload["topic"], "")
+        text = f"Тест «{title}» завершён. Верных ответов: {score}."
+        messages.append((chat_id, text))
+
+    report = (sender or TelegramSender()).send(messages) if messages else Counter()
+    checkpoint.last_event_id = events[-1][0]
+    checkpoint.save(update_fields=["last_event_id", "updated_at"])
+    return len(events), report
@@ -0,0 +1,153 @@
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+# Чтение отчётов с реплики. Middleware решает по запросу, можно ли читать с
+# реплики, и кладёт её алиас в contextvar; роутер отдаёт его в db_for_read.
+# Запись и всё, что вне REPLICA_READ_PATHS, идёт в основную базу.
+
+STICKY_COOKIE = "db_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_alias = ContextVar("read_alias", default=None)
+_lag = {"checked": 0.0, "seconds": None}
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплика — копия основной базы, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схема реплики приходит вместе с репликацией
+        return db == DEFAULT_DB_ALIAS
+
+
+def replica_alias():
+    alias = settings.REPLICA_DATABASE
+    return alias if alias in connections.settings else None
+
+
+def beat():
+    """Записывает пульс в основную базу (команда replica_heartbeat).
+
+    Пульс пишет отдельный процесс, а не запросы: запись ждала бы блокировку
+    SQLite, занятую записями студентов.
+    """
+    from learning.models import ReplicaHeartbeat
+
+    ReplicaHeartbeat.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        pk=1, defaults={"beat_at": timezone.now()}
+    )
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах; None — реплика недоступна.
+
+    Отставание — возраст пульса, который видит реплика. Пульс — отдельная
+    строка, а не данные приложения: без записей в приложении остановленная
+    репликация иначе выглядела бы как нулевое отставание. Результат
+    переиспользуется в течение секунды.
+    """
+    now = time.monotonic()
+    if now - _lag["checked"] < 1:
+        return _lag["seconds"]
+    from learning.models import ReplicaHeartbeat
+
+    try:
+        replica_beat = (
+            ReplicaHeartbeat.objects.using(alias)
+            .filter(pk=1)
+            .values_list("beat_at", flat=True)
+            .first()
+        )
+    except DatabaseError:
+        seconds = None
+    else:
+        seconds = (
+            (timezone.now() - replica_beat).total_seconds() if replica_beat else None
+        )
+    _lag.update(checked=now, seconds=seconds)
+    return seconds
+
+
+def choose_read_alias(request):
+    alias = replica_alias()
+    if (
+        alias is None
+        or request.method not in SAFE_METHODS
+        # недавно писал — читает своё из основной базы
+        or STICKY_COOKIE in request.COOKIES
+        or not any(
+            re.match(pattern, request.path) for pattern in settings.REPLICA_READ_PATHS
+        )
+    ):
+        return None
+    lag = replica_lag(alias)
+    if lag is None or lag > settings.REPLICA_MAX_LAG_SECONDS:
+        return None
+    return alias
+
+
+@contextmanager
+def reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def mark_read_only(request):
+    # запрос с небезопасным методом, который ничего не пишет (пакет из одних
+    # GET): сессию не привязываем к основной базе
+    request._replica_read_only = True
+
+
+def _pinned(alias, content):
+    # потоковый ответ читает базу уже после выхода из middleware
+    iterator = iter(content)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        alias = choose_read_alias(request)
+        with reading_from(alias):
+            response = self.get_response(request)
+
+        if alias and response.streaming:
+            response.streaming_content = _pinned(alias, response.streaming_content)
+        if request.method not in SAFE_METHODS and not getattr(
+            request, "_replica_read_only", False
+        ):
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save
+
+from learning.models import Answer, Attempt, AttemptQuestion
+
+# Разбор попытки, которая уже не в процессе, не меняется: он кэшируется
+# без срока жизни и сбрасывается только при изменении ответов — комментарий
+# преподавателя, перепроверка, правка в админке.
+CACHEABLE_STATUSES = (Attempt.Status.COMPLETED, Attempt.Status.ABANDONED)
+
+
+def _cache():
+    return caches[settings.REVIEW_CACHE_ALIAS]
+
+
+def _key(attempt_id):
+    return f"review:{attempt_id}"
+
+
+def get_cached(attempt):
+    if attempt.status not in CACHEABLE_STATUSES:
+        return None
+    return _cache().get(_key(attempt.pk))
+
+
+def store(attempt, data):
+    if attempt.status in CACHEABLE_STATUSES:
+        _cache().set(_key(attempt.pk), data, timeout=None)
+
+
+def invalidate(attempt_id):
+    # после COMMIT: разбор, запрошенный до него, прочитал бы старые ответы
+    # и снова закэшировал их без срока жизни
+    key = _key(attempt_id)
+    transaction.on_commit(lambda: _cache().delete(key))
+
+
+def _answer_changed(sender, instance, created=False, **kwargs):
+    # новый ответ появляется только у попытки в процессе — её разбор не кэшируется
+    if created:
+        return
+    invalidate(
+        AttemptQuestion.objects.filter(pk=instance.attempt_question_id)
+        .values_list("attempt_id", flat=True)
+        .first()
+    )
+
+
+def _selection_changed(sender, instance, action, reverse, **kwargs):
+    if action.startswith("post_") and not reverse:
+        _answer_changed(sender, instance)
+
+
+def connect_signals():
+    post_save.connect(_answer_changed, sender=Answer)
+    m2m_changed.connect(_selection_changed, sender=Answer.selected_choices.through)
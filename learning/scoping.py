@@ -0,0 +1,86 @@
+from django.db.models import Q
+
+from accounts.roles import get_membership
+from learning.models import Group, GroupStudent
+
+# Построчная видимость данных. Преподаватель видит студентов своих групп,
+# студент — только себя. Отбор идёт подзапросами по GroupStudent, которые
+# SQLite выполняет через индексы (group, student) и (student, group): время
+# зависит от размера групп пользователя, а не от общего числа студентов.
+
+
+def taught_students(teacher_id):
+    return GroupStudent.objects.filter(group__teacher_id=teacher_id).values(
+        "student_id"
+    )
+
+
+def scope_students(queryset, request):
+    if request.user.is_staff:
+        return queryset
+    membership = get_membership(request)
+    condition = Q(pk=membership.student_id) if membership.is_student else Q()
+    if membership.is_teacher:
+        condition |= Q(pk__in=taught_students(membership.teacher_id))
+    return queryset.filter(condition) if condition else queryset.none()
+
+
+def scope_users(queryset, request):
+    if request.user.is_staff:
+        return queryset
+    membership = get_membership(request)
+    condition = Q(pk=request.user.pk)
+    if membership.is_teacher:
+        condition |= Q(
+            pk__in=GroupStudent.objects.filter(
+                group__teacher_id=membership.teacher_id
+            ).values("student__user_id")
+        )
+    return queryset.filter(condition)
+
+
+def scope_teachers(queryset, request):
+    if request.user.is_staff:
+        return queryset
+    membership = get_membership(request)
+    condition = Q(pk=membership.teacher_id) if membership.is_teacher else Q()
+    if membership.is_student:
+        # преподаватели групп студента
+        condition |= Q(
+            pk__in=Group.objects.filter(
+                group_students__student_id=membership.student_id
+            ).values("teacher_id")
+        )
+    return queryset.filter(condition) if condition else queryset.none()
+
+
+def scope_groups(queryset, request):
+    if request.user.is_staff:
+        return queryset
+    membership = get_membership(request)
+    condition = Q(teacher_id=membership.teacher_id) if membership.is_teacher else Q()
+    if membership.is_student:
+        condition |= Q(
+            pk__in=GroupStudent.objects.filter(student_id=membership.student_id).values(
+                "group_id"
+            )
+        )
+    return queryset.filter(condition) if condition else queryset.none()
+
+
+def scope_attempts(queryset, request):
+    # для Attempt и ArchivedAttempt: оба ссылаются на студента полем student
+    if request.user.is_staff:
+        return queryset
+    membership = get_membership(request)
+    condition = Q(student_id=membership.student_id) if membership.is_student else Q()
+    if membership.is_teacher:
+        condition |= Q(student_id__in=taught_students(membership.teacher_id))
+    return queryset.filter(condition) if condition else queryset.none()
+
+
+def scope_topics(queryset, request):
+    membership = get_membership(request)
+    if request.user.is_staff or membership.is_teacher:
+        return queryset
+    return queryset.filter(is_active=True)
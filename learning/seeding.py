@@ -0,0 +1,76 @@
+from accounts.models import Student, Teacher, User
+from learning.models import Choice, Group, GroupStudent, Question, Topic
+
+
+def seed(students=1000, groups=40, topics=50, questions_per_topic=10, prefix="seed"):
+    """Наполняет БД синтетическими данными для бенчмарков и анализа планов.
+
+    Пароли не задаются (make_password слишком медленный для тысяч строк).
+    Возвращает словарь с созданными учителями и группами.
+    """
+    User.objects.bulk_create(
+        User(username=f"{prefix}-t{i}", email=f"{prefix}-t{i}@example.com")
+        for i in range(groups)
+    )
+    User.objects.bulk_create(
+        (
+            User(username=f"{prefix}-s{i}", email=f"{prefix}-s{i}@example.com")
+            for i in range(students)
+        ),
+        batch_size=1000,
+    )
+    teacher_users = User.objects.filter(username__startswith=f"{prefix}-t")
+    student_users = User.objects.filter(username__startswith=f"{prefix}-s")
+    Teacher.objects.bulk_create(Teacher(user=user) for user in teacher_users)
+    Student.objects.bulk_create(
+        (Student(user=user) for user in student_users), batch_size=1000
+    )
+
+    teachers = list(Teacher.objects.filter(user__in=teacher_users).order_by("pk"))
+    Group.objects.bulk_create(
+        Group(name=f"{prefix}-g{i}", teacher=teacher)
+        for i, teacher in enumerate(teachers)
+    )
+    group_list = list(
+        Group.objects.filter(name__startswith=f"{prefix}-g").order_by("pk")
+    )
+    student_ids = Student.objects.filter(user__in=student_users).values_list(
+        "pk", flat=True
+    )
+    GroupStudent.objects.bulk_create(
+        (
+            GroupStudent(group=group_list[i % len(group_list)], student_id=student_id)
+            for i, student_id in enumerate(student_ids)
+        ),
+        batch_size=1000,
+    )
+
+    Topic.objects.bulk_create(
+        Topic(title=f"{prefix}-topic{i}", description=f"Topic {i}")
+        for i in range(topics)
+    )
+    topic_list = Topic.objects.filter(title__startswith=f"{prefix}-topic")
+    Question.objects.bulk_create(
+        (
+            Question(topic=topic, text=f"{topic.title} q{i}")
+            for topic in topic_list
+            for i in range(questions_per_topic)
+        ),
+        batch_size=1000,
+    )
+    Choice.objects.bulk_create(
+        (
+            Choice(
+                question_id=question_id,
+                text=f"c{order}",
+                order=order,
+                is_correct=order == 1,
+            )
+            for question_id in Question.objects.filter(
+                topic__in=topic_list
+            ).values_list("pk", flat=True)
+            for order in range(1, 5)
+        ),
+        batch_size=1000,
+    )
+    return {"teachers": teachers, "groups": group_list}
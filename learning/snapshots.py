@@ -0,0 +1,58 @@
+import hashlib
+import json
+
+from django.apps import apps as global_apps
+
+
+def build_data(question, choices):
+    """Содержимое слепка из строк values(): вопрос {id, text} и его варианты."""
+    ordered = sorted(choices, key=lambda choice: (choice["order"], choice["id"]))
+    return {
+        "question": question["id"],
+        "text": question["text"],
+        "choices": [
+            {"id": choice["id"], "text": choice["text"], "order": choice["order"]}
+            for choice in ordered
+        ],
+        "correct": [choice["id"] for choice in ordered if choice["is_correct"]],
+    }
+
+
+def content_hash(data):
+    encoded = json.dumps(
+        data, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def freeze(question_ids, apps=global_apps):
+    """Слепки текущего состояния вопросов: {question_id: snapshot_id}.
+
+    Уже существующие слепки с тем же содержимым переиспользуются. apps —
+    реестр моделей, чтобы функцию можно было звать из миграций.
+    """
+    Question = apps.get_model("learning", "Question")
+    Choice = apps.get_model("learning", "Choice")
+    QuestionSnapshot = apps.get_model("learning", "QuestionSnapshot")
+
+    choices = {}
+    for row in Choice.objects.filter(question_id__in=question_ids).values(
+        "id", "question_id", "text", "order", "is_correct"
+    ):
+        choices.setdefault(row.pop("question_id"), []).append(row)
+
+    hashes = {}
+    snapshots = []
+    for question in Question.objects.filter(pk__in=question_ids).values("id", "text"):
+        data = build_data(question, choices.get(question["id"], []))
+        hashes[question["id"]] = digest = content_hash(data)
+        snapshots.append(
+            QuestionSnapshot(content_hash=digest, question_id=question["id"], data=data)
+        )
+    QuestionSnapshot.objects.bulk_create(snapshots, ignore_conflicts=True)
+    ids = dict(
+        QuestionSnapshot.objects.filter(content_hash__in=hashes.values()).values_list(
+            "content_hash", "pk"
+        )
+    )
+    return {question_id: ids[digest] for question_id, digest in hashes.items()}
@@ -0,0 +1,102 @@
+import json
+from itertools import batched
+
+from django.core.paginator import InvalidPage
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_PARAM = "stream"
+CHUNK_SIZE = 500
+
+
+class StreamingJSONRenderer:
+    """Кодирует конверт списка по частям: сначала links/count, затем results.
+
+    Формат совпадает с компактным выводом rest_framework JSONRenderer.
+    """
+
+    media_type = "application/json"
+
+    def dumps(self, data):
+        return json.dumps(
+            data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+        )
+
+    def render(self, head, chunks):
+        head_json = self.dumps(head)
+        yield (head_json[:-1] + ',"results":[').encode()
+        first = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            body = self.dumps(chunk)[1:-1]
+            yield (body if first else "," + body).encode()
+            first = False
+        yield b"]}"
+
+
+class StreamingListMixin:
+    # ?stream=1 — текущая страница потоком; ?stream=all — весь список без
+    # пагинации, только для staff. Сжатие договаривает GZipMiddleware.
+    stream_renderer_class = StreamingJSONRenderer
+
+    def list(self, request, *args, **kwargs):
+        mode = request.query_params.get(STREAM_PARAM)
+        if not mode:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if mode == "all":
+            if not request.user.is_staff:
+                raise PermissionDenied("Полная выгрузка доступна только staff.")
+            head = {
+                "links": {"next": None, "previous": None},
+                "count": queryset.count(),
+                "total_pages": 1,
+            }
+            rows = queryset
+        else:
+            head, rows = self.stream_page(request, queryset)
+
+        renderer = self.stream_renderer_class()
+        response = StreamingHttpResponse(
+            renderer.render(head, self.stream_chunks(rows)),
+            content_type=renderer.media_type,
+        )
+        response["Cache-Control"] = "no-store"
+        return response
+
+    def stream_page(self, request, queryset):
+        paginator = self.paginator
+        page_size = paginator.get_page_size(request)
+        django_paginator = paginator.django_paginator_class(queryset, page_size)
+        page_number = request.query_params.get(paginator.page_query_param) or 1
+        try:
+            paginator.page = django_paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(str(exc))
+        paginator.request = request
+        head = {
+            "links": {
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+            },
+            "count": django_paginator.count,
+            "total_pages": django_paginator.num_pages,
+        }
+        # object_list страницы — ленивый срез queryset, строки не загружены
+        return head, paginator.page.object_list
+
+    def stream_chunks(self, queryset):
+        fast_class = getattr(self, "fast_serializer_class", None)
+        if fast_class is not None:
+            fast = fast_class()
+            rows = fast.rows(queryset).iterator(chunk_size=CHUNK_SIZE)
+            for chunk in batched(rows, CHUNK_SIZE):
+                yield fast.to_representation(chunk)
+            return
+
+        rows = queryset.iterator(chunk_size=CHUNK_SIZE)
+        for chunk in batched(rows, CHUNK_SIZE):
+            yield self.get_serializer(list(chunk), many=True).data
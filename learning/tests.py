@@ -1,3 +1,975 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import ProtectedError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Student, Teacher, User
+from accounts.views import StudentViewSet, TeacherViewSet
+from learning import (
+    archive,
+    attempts,
+    events,
+    jobs,
+    leaderboards,
+    replicas,
+    reviews,
+    throttling,
+)
+from learning.attempts import autosave_answer, complete_attempt, start_attempt
+from learning.models import (
+    Answer,
+    ArchivedAttempt,
+    Attempt,
+    AttemptEvent,
+    AttemptQuestion,
+    Choice,
+    Group,
+    GroupStudent,
+    Job,
+    Question,
+    QuestionStats,
+    ReplicaHeartbeat,
+    Topic,
+    TopicStats,
+)
+from learning.notifications import TelegramSender
+from learning.seeding import seed
+from learning.views import GroupViewSet, TopicViewSet
+
+# Кэши в памяти процесса и без лимитов: файловые кэши и корзины токенов
+# из настроек переживают прогон и пересоздание тестовой БД.
+TEST_CACHES = {
+    alias: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": f"test-{alias}",
+    }
+    for alias in ("default", "roles", "reviews")
+}
+
+
+@override_settings(CACHES=TEST_CACHES, LEARNING_THROTTLES={})
+class LearningTestCase(TestCase):
+    """Преподаватель с группой из двух студентов, второй преподаватель
+    с группой из одного студента и тема из трёх вопросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="staff", is_staff=True)
+        cls.teacher = cls.make_teacher("teacher")
+        cls.other_teacher = cls.make_teacher("other-teacher")
+        cls.student = cls.make_student("student")
+        cls.classmate = cls.make_student("classmate")
+        cls.outsider = cls.make_student("outsider")
+        cls.group = Group.objects.create(name="group", teacher=cls.teacher)
+        cls.other_group = Group.objects.create(
+            name="other-group", teacher=cls.other_teacher
+        )
+        GroupStudent.objects.create(group=cls.group, student=cls.student)
+        GroupStudent.objects.create(group=cls.group, student=cls.classmate)
+        GroupStudent.objects.create(group=cls.other_group, student=cls.outsider)
+
+        cls.topic = Topic.objects.create(title="topic")
+        for order in range(1, 4):
+            question = Question.objects.create(topic=cls.topic, text=f"q{order}")
+            Choice.objects.create(question=question, text="right", is_correct=True)
+            Choice.objects.create(question=question, text="wrong", order=2)
+
+    @staticmethod
+    def make_teacher(username):
+        return Teacher.objects.create(user=User.objects.create(username=username))
+
+    @staticmethod
+    def make_student(username):
+        return Student.objects.create(user=User.objects.create(username=username))
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        # окно склейки автосохранений — в отдельном файле, свой на тест
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(
+            override_settings(AUTOSAVE_STORE_PATH=f"{directory.name}/autosave.sqlite3")
+        )
+        self.enterContext(mock.patch.object(attempts, "_pending_store", None))
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def choices(self, attempt_question, is_correct):
+        return set(
+            Choice.objects.filter(
+                question_id=attempt_question.question_id, is_correct=is_correct
+            ).values_list("pk", flat=True)
+        )
+
+    def selected(self, attempt_question):
+        answer = Answer.objects.get(attempt_question=attempt_question)
+        return set(answer.selected_choices.values_list("pk", flat=True))
+
+
+class AutosaveTests(LearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.attempt = start_attempt(self.student.pk, self.topic)
+        self.first = self.attempt.attempt_questions.order_by("order").first()
+
+    def age_answer(self, attempt_question):
+        # последняя запись вышла за окно склейки
+        attempts.get_pending_store().connection().execute(
+            "UPDATE pending SET written = written - 60 WHERE attempt_question = ?",
+            (attempt_question.pk,),
+        )
+
+    def pending(self):
+        return {
+            pk: json.loads(choices)
+            for pk, choices in attempts.get_pending_store()
+            .pending([self.attempt.pk])
+            .items()
+        }
+
+    def answered_events(self):
+        return AttemptEvent.objects.filter(
+            attempt=self.attempt, kind=AttemptEvent.Kind.ANSWERED
+        ).count()
+
+    def test_save_writes_only_the_difference(self):
+        right = self.choices(self.first, True)
+        wrong = self.choices(self.first, False)
+        through = Answer.selected_choices.through
+        autosave_answer(self.first, right)
+        kept = through.objects.get(choice_id__in=right)
+
+        self.age_answer(self.first)
+        autosave_answer(self.first, right | wrong)
+        self.assertEqual(self.selected(self.first), right | wrong)
+        # уже выбранный вариант не пересоздаётся
+        self.assertTrue(through.objects.filter(pk=kept.pk).exists())
+
+        self.age_answer(self.first)
+        self.assertTrue(autosave_answer(self.first, right | wrong))
+        self.assertEqual(self.answered_events(), 2)
+
+    def test_saves_inside_window_are_coalesced(self):
+        right = self.choices(self.first, True)
+        wrong = self.choices(self.first, False)
+        self.assertTrue(autosave_answer(self.first, wrong))
+        # склеенное сохранение не обращается к основной БД
+        with self.assertNumQueries(0):
+            self.assertFalse(autosave_answer(self.first, right | wrong))
+            self.assertFalse(autosave_answer(self.first, right))
+        self.assertEqual(self.selected(self.first), wrong)
+        self.assertEqual(self.pending(), {self.first.pk: sorted(right)})
+
+        self.age_answer(self.first)
+        self.assertTrue(autosave_answer(self.first, right))
+        self.assertEqual(self.selected(self.first), right)
+        self.assertEqual(self.pending(), {})
+        self.assertEqual(self.answered_events(), 2)
+
+    def test_complete_grades_pending_choice_from_another_process(self):
+        wrong = self.choices(self.first, False)
+        right = self.choices(self.first, True)
+        self.assertTrue(autosave_answer(self.first, wrong))
+        self.assertFalse(autosave_answer(self.first, right))
+        # завершение приходит в другой процесс: своё соединение с файлом
+        attempts._pending_store = None
+        for cache in caches.all():
+            cache.clear()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attempt = complete_attempt(self.attempt)
+        self.assertEqual(self.selected(self.first), right)
+        self.assertEqual(attempt.score, 1)
+        self.assertEqual(self.pending(), {})
+
+    def test_rolled_back_flush_keeps_pending_choice(self):
+        right = self.choices(self.first, True)
+        autosave_answer(self.first, self.choices(self.first, False))
+        autosave_answer(self.first, right)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    attempts.flush_pending_answers([self.attempt.pk])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.pending(), {self.first.pk: sorted(right)})
+
+    def test_abandon_flushes_pending_choices(self):
+        wrong = self.choices(self.first, False)
+        right = self.choices(self.first, True)
+        autosave_answer(self.first, wrong)
+        autosave_answer(self.first, right)
+        Attempt.objects.filter(pk=self.attempt.pk).update(
+            started_at=timezone.now() - timedelta(days=1)
+        )
+
+        call_command("abandon_stale_attempts", stdout=StringIO())
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.status, Attempt.Status.ABANDONED)
+        self.assertEqual(self.selected(self.first), right)
+
+    def test_autosave_endpoint_reports_coalescing(self):
+        client = self.client_for(self.student.user)
+        url = f"/api/attempt/{self.attempt.pk}/autosave/"
+        wrong = sorted(self.choices(self.first, False))
+        right = sorted(self.choices(self.first, True))
+        response = client.post(
+            url,
+            {"attempt_question": self.first.pk, "selected_choices": wrong},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        response = client.post(
+            url,
+            {"attempt_question": self.first.pk, "selected_choices": right},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 202)
+        response = client.post(f"/api/attempt/{self.attempt.pk}/complete/")
+        self.assertEqual(response.json()["score"], 1)
+
+
+class GradingTests(LearningTestCase):
+    def test_score_counts_exact_matches_from_snapshots(self):
+        attempt = start_attempt(self.student.pk, self.topic)
+        first, second, third = attempt.attempt_questions.order_by("order")
+        autosave_answer(first, self.choices(first, True))
+        # лишний вариант делает ответ неверным
+        autosave_answer(
+            second, self.choices(second, True) | self.choices(second, False)
+        )
+        # правка ключа после выдачи не меняет проверку попытки
+        wrong = self.choices(third, False)
+        Choice.objects.filter(question_id=third.question_id).update(is_correct=True)
+        autosave_answer(third, wrong)
+
+        attempt = complete_attempt(attempt)
+        self.assertEqual(attempt.score, 1)
+        self.assertEqual(
+            dict(
+                Answer.objects.filter(attempt_question__attempt=attempt).values_list(
+                    "attempt_question_id", "is_correct"
+                )
+            ),
+            {first.pk: True, second.pk: False, third.pk: False},
+        )
+        self.assertEqual(
+            AttemptEvent.objects.filter(
+                attempt=attempt, kind=AttemptEvent.Kind.GRADED
+            ).count(),
+            3,
+        )
+
+    def test_unanswered_questions_score_zero(self):
+        attempt = complete_attempt(start_attempt(self.student.pk, self.topic))
+        self.assertEqual(attempt.score, 0)
+        self.assertEqual(AttemptQuestion.objects.filter(attempt=attempt).count(), 3)
+
+    def test_selected_choice_cannot_be_deleted(self):
+        attempt = start_attempt(self.student.pk, self.topic)
+        first = attempt.attempt_questions.order_by("order").first()
+        right = self.choices(first, True)
+        autosave_answer(first, right)
+        complete_attempt(attempt)
+
+        with self.assertRaises(ProtectedError):
+            Choice.objects.filter(pk__in=right).delete()
+        self.assertEqual(self.selected(first), right)
+        # невыбранный вариант удаляется, слепок сохраняет его для разбора
+        Choice.objects.filter(pk__in=self.choices(first, False)).delete()
+        review = self.client_for(self.teacher.user).get(
+            f"/api/attempt/{attempt.pk}/review/"
+        )
+        question = next(q for q in review.json()["questions"] if q["id"] == first.pk)
+        self.assertEqual(question["selected_choices"], sorted(right))
+        self.assertEqual(len(question["choices"]), 2)
+
+
+class LeaderboardTests(LearningTestCase):
+    def finish(self, student, correct):
+        attempt = start_attempt(student.pk, self.topic)
+        for attempt_question in attempt.attempt_questions.order_by("order")[:correct]:
+            autosave_answer(attempt_question, self.choices(attempt_question, True))
+        return complete_attempt(attempt)
+
+    def ranks(self, group=None):
+        return [
+            (row["rank"], row["student"])
+            for row in leaderboards.top(self.topic.pk, group and group.pk)
+        ]
+
+    def test_best_score_first_then_earliest(self):
+        self.finish(self.student, 2)
+        self.finish(self.classmate, 2)
+        self.finish(self.outsider, 3)
+        # худший результат не вытесняет лучший
+        self.finish(self.student, 1)
+
+        self.assertEqual(
+            self.ranks(),
+            [(1, self.outsider.pk), (2, self.student.pk), (3, self.classmate.pk)],
+        )
+        self.assertEqual(
+            self.ranks(self.group), [(1, self.student.pk), (2, self.classmate.pk)]
+        )
+        self.assertEqual(
+            leaderboards.rank_of(self.topic.pk, self.classmate.pk)["rank"], 3
+        )
+        self.assertEqual(
+            leaderboards.rank_of(self.topic.pk, self.classmate.pk, self.group.pk)[
+                "rank"
+            ],
+            2,
+        )
+
+    def test_group_board_follows_membership(self):
+        self.finish(self.student, 1)
+        self.finish(self.outsider, 3)
+
+        membership = GroupStudent.objects.create(
+            group=self.group, student=self.outsider
+        )
+        self.assertEqual(
+            self.ranks(self.group), [(1, self.outsider.pk), (2, self.student.pk)]
+        )
+        membership.delete()
+        self.assertEqual(self.ranks(self.group), [(1, self.student.pk)])
+
+        self.group.students.add(self.outsider)
+        self.assertEqual(len(self.ranks(self.group)), 2)
+        self.group.students.remove(self.student)
+        self.assertEqual(self.ranks(self.group), [(1, self.outsider.pk)])
+        self.outsider.groups.clear()
+        self.assertEqual(self.ranks(self.group), [])
+
+    def test_group_leaderboard_requires_integer_topic(self):
+        self.finish(self.student, 2)
+        client = self.client_for(self.teacher.user)
+        url = f"/api/group/{self.group.pk}/leaderboard/"
+        self.assertEqual(client.get(url, {"topic": "abc"}).status_code, 400)
+        self.assertEqual(client.get(url).status_code, 400)
+        response = client.get(url, {"topic": self.topic.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["top"][0]["student"], self.student.pk)
+
+    def test_rank_of_student_outside_scope_is_hidden(self):
+        self.finish(self.outsider, 3)
+        self.finish(self.classmate, 1)
+        url = f"/api/topic/{self.topic.pk}/leaderboard/"
+        client = self.client_for(self.student.user)
+        response = client.get(url, {"student": self.outsider.pk})
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("outsider", response.content.decode())
+        # одноклассник тоже чужой: студент видит только своё место
+        response = client.get(url, {"student": self.classmate.pk})
+        self.assertEqual(response.status_code, 404)
+
+        client = self.client_for(self.teacher.user)
+        response = client.get(url, {"student": self.classmate.pk})
+        self.assertEqual(response.json()["student"]["rank"], 2)
+        response = client.get(url, {"student": self.outsider.pk})
+        self.assertEqual(response.status_code, 404)
+
+
+class FastSerializerTests(LearningTestCase):
+    VIEWSETS = {
+        "topic": TopicViewSet,
+        "group": GroupViewSet,
+        "student": StudentViewSet,
+        "teacher": TeacherViewSet,
+    }
+
+    def test_fast_lists_match_model_serializers(self):
+        seed(students=30, groups=4, topics=5, questions_per_topic=1, prefix="fast")
+        Student.objects.filter(user__username="fast-s0").update(telegram_chat_id=42)
+        Topic.objects.filter(title="fast-topic0").update(is_active=False)
+        for user in (self.staff, self.teacher.user, self.student.user):
+            client = self.client_for(user)
+            for name, viewset in self.VIEWSETS.items():
+                with self.subTest(user=user.username, list=name):
+                    url = f"/api/{name}/?page_size=200"
+                    fast = client.get(url)
+                    self.assertEqual(fast.status_code, 200)
+                    with mock.patch.object(viewset, "fast_serializer_class", None):
+                        slow = client.get(url)
+                    # ответы совпадают побайтно
+                    self.assertEqual(fast.content, slow.content)
+
+
+class ScopingTests(LearningTestCase):
+    def ids(self, user, url):
+        response = self.client_for(user).get(url)
+        self.assertEqual(response.status_code, 200)
+        return {row["id"] for row in response.json()["results"]}
+
+    def test_student_sees_only_own_rows(self):
+        user = self.student.user
+        self.assertEqual(self.ids(user, "/api/student/"), {self.student.pk})
+        self.assertEqual(self.ids(user, "/api/user/"), {user.pk})
+        self.assertEqual(self.ids(user, "/api/group/"), {self.group.pk})
+        self.assertEqual(self.ids(user, "/api/teacher/"), {self.teacher.pk})
+
+    def test_teacher_sees_students_of_own_groups(self):
+        user = self.teacher.user
+        self.assertEqual(
+            self.ids(user, "/api/student/"), {self.student.pk, self.classmate.pk}
+        )
+        self.assertEqual(self.ids(user, "/api/group/"), {self.group.pk})
+        self.assertEqual(
+            self.ids(user, "/api/user/"),
+            {user.pk, self.student.user.pk, self.classmate.user.pk},
+        )
+
+    def test_attempts_follow_student_scope(self):
+        own = start_attempt(self.student.pk, self.topic)
+        foreign = start_attempt(self.outsider.pk, self.topic)
+        self.assertEqual(self.ids(self.student.user, "/api/attempt/"), {own.pk})
+        self.assertEqual(self.ids(self.teacher.user, "/api/attempt/"), {own.pk})
+        self.assertEqual(self.ids(self.staff, "/api/attempt/"), {own.pk, foreign.pk})
+
+    def test_inactive_topics_hidden_from_students(self):
+        hidden = Topic.objects.create(title="hidden", is_active=False)
+        self.assertNotIn(hidden.pk, self.ids(self.student.user, "/api/topic/"))
+        self.assertIn(hidden.pk, self.ids(self.teacher.user, "/api/topic/"))
+
+    def test_full_export_is_staff_only(self):
+        client = self.client_for(self.teacher.user)
+        self.assertEqual(client.get("/api/student/?stream=all").status_code, 403)
+        response = self.client_for(self.staff).get("/api/student/?stream=all")
+        self.assertEqual(response.status_code, 200)
+
+
+class StreamingTests(LearningTestCase):
+    def setUp(self):
+        super().setUp()
+        for student in (self.student, self.classmate, self.outsider):
+            complete_attempt(start_attempt(student.pk, self.topic))
+
+    def test_stream_matches_list_body(self):
+        client = self.client_for(self.teacher.user)
+        # group — быстрый сериализатор со списком students, attempt — обычный
+        for url in ("/api/group/", "/api/attempt/"):
+            with self.subTest(url=url):
+                expected = client.get(url).content
+                response = client.get(url, {"stream": 1})
+                self.assertTrue(response.streaming)
+                self.assertEqual(b"".join(response.streaming_content), expected)
+                self.assertEqual(response["Cache-Control"], "no-store")
+        groups = json.loads(client.get("/api/group/", {"stream": 1}).getvalue())
+        self.assertEqual(
+            sorted(groups["results"][0]["students"]),
+            sorted([self.student.pk, self.classmate.pk]),
+        )
+
+    def test_stream_is_gzipped_on_request(self):
+        client = self.client_for(self.teacher.user)
+        expected = client.get("/api/attempt/").content
+        response = client.get(
+            "/api/attempt/", {"stream": 1}, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(body, expected)
+        self.assertEqual(len(json.loads(body)["results"]), 2)
+
+
+class BotAPIStandIn(BaseHTTPRequestHandler):
+    # отвечает 502 на первый запрос к каждому чату, затем ok
+    seen = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if body["chat_id"] in self.seen:
+            self.reply(200, {"ok": True})
+        else:
+            self.seen.add(body["chat_id"])
+            self.reply(502, None)
+
+    def reply(self, status, data):
+        payload = json.dumps(data).encode() if data else b"Bad Gateway"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TelegramSenderTests(TestCase):
+    def setUp(self):
+        BotAPIStandIn.seen = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), BotAPIStandIn)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    @mock.patch("learning.notifications.random.uniform", return_value=0)
+    def test_retries_server_errors_without_logging_token(self, uniform):
+        sender = TelegramSender(
+            token="123:SECRET",
+            api_base=f"http://127.0.0.1:{self.server.server_port}",
+            rate="1000/s",
+        )
+        with self.assertLogs("learning.notifications", "WARNING") as logs:
+            report = sender.send([(1, "a"), (2, "b")])
+        self.assertEqual(report["sent"], 2)
+        self.assertEqual(report["retries"], 2)
+        self.assertIn("telegram 1: HTTP 502", "\n".join(logs.output))
+        self.assertNotIn("SECRET", "\n".join(logs.output))
+
+
+class ReviewCacheTests(LearningTestCase):
+    def setUp(self):
+        super().setUp()
+        attempt = start_attempt(self.student.pk, self.topic)
+        self.first = attempt.attempt_questions.order_by("order").first()
+        autosave_answer(self.first, self.choices(self.first, True))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.attempt = complete_attempt(attempt)
+        self.url = f"/api/attempt/{self.attempt.pk}/review/"
+
+    def test_review_is_cached_and_dropped_after_commit(self):
+        client = self.client_for(self.teacher.user)
+        self.assertEqual(client.get(self.url).status_code, 200)
+        # только сама попытка: роли и разбор — из кэша
+        with self.assertNumQueries(1):
+            client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            answer = Answer.objects.get(attempt_question=self.first)
+            answer.teacher_comment = "ok"
+            answer.save()
+            # до COMMIT в кэше прежний разбор
+            self.assertIsNotNone(reviews.get_cached(self.attempt))
+        self.assertIsNone(reviews.get_cached(self.attempt))
+
+    def test_teacher_comment_appears_in_review(self):
+        client = self.client_for(self.teacher.user)
+        client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(
+                f"/api/attempt/{self.attempt.pk}/comment/",
+                {"attempt_question": self.first.pk, "teacher_comment": "ok"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        questions = client.get(self.url).json()["questions"]
+        self.assertEqual(questions[0]["teacher_comment"], "ok")
+
+
+class ArchiveTests(LearningTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(ATTEMPT_ARCHIVE_DIR=directory.name))
+
+        attempt = start_attempt(self.student.pk, self.topic)
+        self.first = attempt.attempt_questions.order_by("order").first()
+        autosave_answer(self.first, self.choices(self.first, True))
+        self.attempt = complete_attempt(attempt)
+        self.started_at = timezone.now() - timedelta(days=400)
+        Attempt.objects.filter(pk=attempt.pk).update(started_at=self.started_at)
+
+    def test_archive_moves_attempt_to_summary_and_file(self):
+        self.assertEqual(archive.archive_batch([self.attempt.pk]), 1)
+        self.assertFalse(Attempt.objects.filter(pk=self.attempt.pk).exists())
+        self.assertFalse(AttemptQuestion.objects.filter(pk=self.first.pk).exists())
+
+        archived = ArchivedAttempt.objects.get(pk=self.attempt.pk)
+        self.assertEqual(
+            (archived.score, archived.question_count, archived.started_at),
+            (1, 3, self.started_at),
+        )
+        with gzip.open(
+            archive.archive_dir() / archived.archive_file, "rt", encoding="utf-8"
+        ) as fh:
+            self.assertEqual(len(fh.readlines()), 1)
+
+        client = self.client_for(self.teacher.user)
+        data = client.get(f"/api/archived-attempt/{archived.pk}/").json()
+        self.assertEqual(data["score"], 1)
+        question = data["attempt"]["questions"][0]
+        self.assertEqual(question["id"], self.first.pk)
+        self.assertEqual(
+            question["answer"]["selected_choices"],
+            sorted(self.choices(self.first, True)),
+        )
+        # чужой преподаватель архивную попытку не видит
+        client = self.client_for(self.other_teacher.user)
+        response = client.get(f"/api/archived-attempt/{archived.pk}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_restore_round_trip(self):
+        archive.archive_batch([self.attempt.pk])
+        self.assertEqual(archive.restore(ArchivedAttempt.objects.all()), (1, 0))
+
+        self.assertFalse(ArchivedAttempt.objects.exists())
+        attempt = Attempt.objects.get(pk=self.attempt.pk)
+        self.assertEqual(
+            (attempt.started_at, attempt.score, attempt.status),
+            (self.started_at, 1, Attempt.Status.COMPLETED),
+        )
+        self.assertEqual(self.selected(self.first), self.choices(self.first, True))
+        self.assertEqual(
+            AttemptQuestion.objects.get(pk=self.first.pk).snapshot_id,
+            self.first.snapshot_id,
+        )
+
+    def test_restore_skips_attempt_with_deleted_question(self):
+        archive.archive_batch([self.attempt.pk])
+        Question.objects.filter(pk=self.first.question_id).delete()
+
+        self.assertEqual(archive.restore(ArchivedAttempt.objects.all()), (0, 1))
+        self.assertTrue(ArchivedAttempt.objects.filter(pk=self.attempt.pk).exists())
+        self.assertFalse(Attempt.objects.filter(pk=self.attempt.pk).exists())
+
+
+class ThrottleTests(LearningTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(
+            override_settings(THROTTLE_STORE_PATH=f"{directory.name}/throttle.sqlite3")
+        )
+        # хранилище создаётся один раз на процесс
+        self.enterContext(mock.patch.object(throttling, "_store", None))
+        self.url = f"/api/topic/{self.topic.pk}/leaderboard/"
+
+    def limits(self, **config):
+        config = {"rate": "1/h", "burst": 10, **config}
+        return self.settings(LEARNING_THROTTLES={"reports": config})
+
+    def statuses(self, user, count):
+        client = self.client_for(user)
+        return [client.get(self.url).status_code for _ in range(count)]
+
+    def tokens(self):
+        return dict(
+            throttling.get_store()
+            .connection()
+            .execute("SELECT key, tokens FROM bucket")
+            .fetchall()
+        )
+
+    def test_exhausted_burst_returns_retry_after(self):
+        with self.limits(burst=2):
+            self.assertEqual(self.statuses(self.student.user, 2), [200, 200])
+            response = self.client_for(self.student.user).get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 3000)
+
+    def test_denied_request_takes_no_tokens(self):
+        with self.limits(burst=1, group_rate="1/h", group_burst=5):
+            self.assertEqual(self.statuses(self.student.user, 3), [200, 429, 429])
+            tokens = self.tokens()
+        self.assertAlmostEqual(tokens[f"reports:user:{self.student.user.pk}"], 0, 2)
+        self.assertAlmostEqual(tokens[f"reports:group:{self.group.pk}"], 4, 2)
+
+    def test_group_bucket_is_shared_by_classmates(self):
+        with self.limits(group_rate="1/h", group_burst=2):
+            self.assertEqual(self.statuses(self.student.user, 2), [200, 200])
+            self.assertEqual(self.statuses(self.classmate.user, 1), [429])
+            self.assertEqual(self.statuses(self.outsider.user, 1), [200])
+            # преподаватель не состоит в группах и тратит только свою корзину
+            self.assertEqual(self.statuses(self.teacher.user, 1), [200])
+
+    def test_user_and_group_overrides(self):
+        with self.limits(
+            burst=1,
+            group_rate="1/h",
+            group_burst=1,
+            users={self.student.user.pk: {"burst": 3}},
+            groups={self.group.pk: {"group_burst": 3}},
+        ):
+            self.assertEqual(self.statuses(self.student.user, 3), [200, 200, 200])
+            self.assertEqual(self.statuses(self.student.user, 1), [429])
+            self.assertEqual(self.statuses(self.outsider.user, 2), [200, 429])
+
+
+class JobTests(LearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+        def flaky(job, fail=True):
+            self.calls.append(job.attempts)
+            if fail:
+                raise RuntimeError("boom")
+            return {"ok": True}
+
+        patcher = mock.patch.dict(jobs.HANDLERS, {"flaky": (flaky, 2)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claim_takes_priority_then_age(self):
+        low, _ = jobs.enqueue("flaky")
+        high, _ = jobs.enqueue("flaky", priority=5)
+        later, _ = jobs.enqueue("flaky")
+        Job.objects.filter(pk=later.pk).update(
+            run_after=timezone.now() + timedelta(minutes=1)
+        )
+        self.assertEqual(jobs.claim("w").pk, high.pk)
+        self.assertEqual(jobs.claim("w").pk, low.pk)
+        # отложенная задача ещё не готова
+        self.assertIsNone(jobs.claim("w"))
+
+    def test_dedupe_key_returns_active_job(self):
+        job, created = jobs.enqueue("flaky", dedupe_key="k")
+        self.assertTrue(created)
+        self.assertEqual(jobs.enqueue("flaky", dedupe_key="k"), (job, False))
+        Job.objects.filter(pk=job.pk).update(status=Job.Status.SUCCEEDED)
+        self.assertTrue(jobs.enqueue("flaky", dedupe_key="k")[1])
+
+    @override_settings(JOB_RETRY_DELAY_SECONDS=30)
+    def test_failure_is_retried_with_backoff_then_fails(self):
+        jobs.enqueue("flaky")
+        with self.assertLogs("learning.jobs", "ERROR"):
+            self.assertFalse(jobs.run(jobs.claim("w")))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertAlmostEqual(
+            (job.run_after - timezone.now()).total_seconds(), 30, delta=5
+        )
+        self.assertIsNone(jobs.claim("w"))
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs("learning.jobs", "ERROR"):
+            self.assertFalse(jobs.run(jobs.claim("w")))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 2))
+        self.assertIn("boom", job.error)
+        self.assertEqual(self.calls, [1, 2])
+
+    def test_expired_lease_is_requeued(self):
+        jobs.enqueue("flaky", {"fail": False})
+        job = jobs.claim("w")
+        Job.objects.update(locked_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertTrue(jobs.run(jobs.claim("w2")))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (Job.Status.SUCCEEDED, {"ok": True}))
+
+
+class RegradeTests(LearningTestCase):
+    def setUp(self):
+        super().setUp()
+        self.question = Question.objects.order_by("pk").first()
+        self.right, self.wrong = Choice.objects.filter(question=self.question).order_by(
+            "order"
+        )
+
+    def finish(self, student, choice):
+        attempt = start_attempt(student.pk, self.topic)
+        autosave_answer(
+            attempt.attempt_questions.get(question=self.question), {choice.pk}
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return complete_attempt(attempt)
+
+    def regrade(self):
+        Choice.objects.filter(pk=self.right.pk).update(is_correct=False)
+        Choice.objects.filter(pk=self.wrong.pk).update(is_correct=True)
+        jobs.enqueue("regrade", {"question": self.question.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(jobs.run(jobs.claim("w")))
+        return Job.objects.get(kind="regrade")
+
+    def test_regrade_applies_corrected_key(self):
+        first = self.finish(self.student, self.right)
+        second = self.finish(self.classmate, self.wrong)
+        events.consume()
+        review_url = f"/api/attempt/{first.pk}/review/"
+        client = self.client_for(self.teacher.user)
+        client.get(review_url)
+
+        job = self.regrade()
+        self.assertEqual(job.result, {"attempts": 2, "scores_changed": 2})
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.score, second.score), (0, 1))
+        self.assertEqual(
+            [row["student"] for row in leaderboards.top(self.topic.pk, self.group.pk)],
+            [self.classmate.pk, self.student.pk],
+        )
+        # текст и варианты слепка прежние, сменился только ключ
+        snapshot = first.attempt_questions.get(question=self.question).snapshot
+        self.assertEqual(snapshot.data["correct"], [self.wrong.pk])
+        self.assertEqual(snapshot.data["choices"][0]["text"], "right")
+        questions = client.get(review_url).json()["questions"]
+        question = next(q for q in questions if q["question"] == self.question.pk)
+        self.assertEqual(
+            [choice["is_correct"] for choice in question["choices"]], [False, True]
+        )
+
+        # статистика поправлена, а не посчитана заново
+        events.consume()
+        stats = QuestionStats.objects.get(question=self.question)
+        self.assertEqual((stats.graded, stats.correct), (2, 1))
+        self.assertEqual(TopicStats.objects.get(topic=self.topic).score_total, 1)
+
+        # повтор ничего не меняет
+        Job.objects.all().delete()
+        self.assertEqual(self.regrade().result, {"attempts": 0, "scores_changed": 0})
+
+    def test_attempt_in_progress_is_graded_with_corrected_key(self):
+        attempt = start_attempt(self.student.pk, self.topic)
+        self.regrade()
+        autosave_answer(
+            attempt.attempt_questions.get(question=self.question), {self.wrong.pk}
+        )
+        self.assertEqual(complete_attempt(attempt).score, 1)
+
+
+class BatchReplicaTests(LearningTestCase):
+    def post_batch(self, items):
+        seen = []
+
+        def db_for_read(router, model, **hints):
+            seen.append(replicas._read_alias.get())
+
+        client = self.client_for(self.teacher.user)
+        with (
+            mock.patch.object(replicas, "replica_alias", return_value="replica"),
+            mock.patch.object(replicas, "replica_lag", return_value=0),
+            mock.patch.object(replicas.ReplicaRouter, "db_for_read", db_for_read),
+        ):
+            response = client.post(
+                "/api/batch/",
+                {"requests": items},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        return response, set(seen)
+
+    def test_get_only_batch_reads_replica_without_sticky_cookie(self):
+        items = [
+            {"method": "GET", "path": "/api/topic/"},
+            {"method": "GET", "path": "/api/group/"},
+        ]
+        response, seen = self.post_batch(items)
+        self.assertNotIn(replicas.STICKY_COOKIE, response.cookies)
+        self.assertIn("replica", seen)
+
+    def test_batch_with_write_reads_primary_and_sticks(self):
+        response, seen = self.post_batch(
+            [
+                {
+                    "method": "PATCH",
+                    "path": f"/api/group/{self.group.pk}/",
+                    "body": {"description": "new"},
+                },
+                {"method": "GET", "path": "/api/group/"},
+            ]
+        )
+        self.assertEqual(response.json()["responses"][1]["status"], 200)
+        self.assertIn(replicas.STICKY_COOKIE, response.cookies)
+        self.assertEqual(seen, {None})
+
+
+class ChangeFeedTests(LearningTestCase):
+    def feed(self, user, url, since, **params):
+        response = self.client_for(user).get(url, {"since": since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, page):
+        return [row["id"] for row in page["results"]]
+
+    def test_token_returns_only_later_changes_and_deletions(self):
+        start = self.feed(self.teacher.user, "/api/topic/", 0)
+        self.assertEqual(self.ids(start), [self.topic.pk])
+        self.assertFalse(start["has_more"])
+
+        new = Topic.objects.create(title="new")
+        gone = Topic.objects.create(title="gone")
+        token = self.feed(self.teacher.user, "/api/topic/", start["token"])["token"]
+        gone_pk = gone.pk
+        gone.delete()
+        page = self.feed(self.teacher.user, "/api/topic/", start["token"])
+        self.assertEqual(self.ids(page), [new.pk])
+        self.assertEqual(page["deleted"], [gone_pk])
+
+        page = self.feed(self.teacher.user, "/api/topic/", page["token"])
+        self.assertEqual((page["results"], page["deleted"]), ([], []))
+        self.assertGreater(page["token"], token)
+
+    @override_settings(CHANGE_FEED_LIMIT=1)
+    def test_window_is_continued_by_next_token(self):
+        first = Topic.objects.create(title="first")
+        second = Topic.objects.create(title="second")
+        since = self.topic.change_seq
+        page = self.feed(self.staff, "/api/topic/", since)
+        self.assertEqual((self.ids(page), page["has_more"]), ([first.pk], True))
+        page = self.feed(self.staff, "/api/topic/", page["token"])
+        self.assertEqual((self.ids(page), page["has_more"]), ([second.pk], False))
+
+    def test_choice_edit_bumps_question(self):
+        question = Question.objects.order_by("pk").first()
+        since = self.feed(self.teacher.user, "/api/question/", 0)["token"]
+        question.choices.filter(is_correct=False).update(text="plain")
+        Choice.objects.create(question=question, text="added", order=3)
+        page = self.feed(self.teacher.user, "/api/question/", since)
+        self.assertEqual(self.ids(page), [question.pk])
+        self.assertIn(
+            "added", [choice["text"] for choice in page["results"][0]["choices"]]
+        )
+
+    def test_filter_applies_to_questions(self):
+        other = Topic.objects.create(title="other")
+        extra = Question.objects.create(topic=other, text="extra")
+        client = self.client_for(self.teacher.user)
+        response = client.get("/api/question/", {"topic": other.pk})
+        self.assertEqual([row["id"] for row in response.json()["results"]], [extra.pk])
+        page = self.feed(self.teacher.user, "/api/question/", 0, topic=other.pk)
+        self.assertEqual(self.ids(page), [extra.pk])
+
+    def test_rows_leaving_scope_are_reported_deleted(self):
+        since = self.feed(self.student.user, "/api/group/", 0)["token"]
+        GroupStudent.objects.filter(student=self.student).delete()
+        page = self.feed(self.student.user, "/api/group/", since)
+        self.assertEqual((page["results"], page["deleted"]), ([], [self.group.pk]))
+        # одноклассник остался в группе и получает её изменение
+        page = self.feed(self.classmate.user, "/api/group/", since)
+        self.assertEqual(self.ids(page), [self.group.pk])
+
+
+class ReplicaLagTests(TestCase):
+    def setUp(self):
+        replicas._lag.update(checked=0.0, seconds=None)
+
+    def test_lag_check_only_reads_the_heartbeat(self):
+        # пульса ещё нет: отставание неизвестно, запрос ничего не пишет
+        with self.assertNumQueries(1):
+            self.assertIsNone(replicas.replica_lag(DEFAULT_DB_ALIAS))
+        self.assertFalse(ReplicaHeartbeat.objects.exists())
+
+        call_command("replica_heartbeat", once=True)
+        replicas._lag.update(checked=0.0)
+        self.assertLess(replicas.replica_lag(DEFAULT_DB_ALIAS), 1)
+
+    def test_stopped_replication_shows_as_lag(self):
+        ReplicaHeartbeat.objects.create(
+            pk=1, beat_at=timezone.now() - timedelta(minutes=5)
+        )
+        # реплика, переставшая принимать изменения, видит только старый пульс
+        self.assertGreaterEqual(replicas.replica_lag(DEFAULT_DB_ALIAS), 300)
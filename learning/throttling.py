@@ -0,0 +1,112 @@
+import math
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from accounts.roles import get_membership
+from learning.localstore import LocalStore
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    # "30/min" -> токенов в секунду
+    count, period = rate.split("/")
+    return int(count) / PERIODS[period[0]]
+
+
+class TokenBucketStore(LocalStore):
+    """Корзины токенов в отдельном SQLite-файле.
+
+    Файл общий для всех процессов на машине, поэтому лимит один на всех
+    воркеров, и не конкурирует за блокировку с основной БД.
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS bucket ("
+        "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+    )
+    # состояние корзин не страшно потерять при сбое
+    synchronous = "OFF"
+
+    def take(self, buckets, cost=1.0):
+        """Списывает cost из всех корзин сразу или ни из одной.
+
+        buckets: [(key, capacity, refill_per_second)]. Возвращает 0, если
+        запрос разрешён, иначе сколько секунд ждать.
+        """
+        now = time.time()
+        with self.immediate() as conn:
+            updates = []
+            wait = 0.0
+            for key, capacity, refill in buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated FROM bucket WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = capacity
+                if row is not None:
+                    tokens = min(capacity, row[0] + (now - row[1]) * refill)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / refill)
+                updates.append((key, tokens - cost, now))
+            if not wait:
+                conn.executemany(
+                    "INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET "
+                    "tokens = excluded.tokens, updated = excluded.updated",
+                    updates,
+                )
+        return wait
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = TokenBucketStore(settings.THROTTLE_STORE_PATH)
+    return _store
+
+
+class ScopedTokenBucketThrottle(BaseThrottle):
+    """Лимит по view.throttle_scope из LEARNING_THROTTLES.
+
+    Каждый пользователь тратит свою корзину (rate/burst) и корзины всех
+    своих групп (group_rate/group_burst). В users и groups настроек scope
+    можно переопределить лимиты для отдельных пользователей и групп.
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0
+        scope = getattr(view, "throttle_scope", None)
+        config = settings.LEARNING_THROTTLES.get(scope)
+        if config is None or not request.user.is_authenticated:
+            return True
+
+        user_id = request.user.pk
+        user_config = config | config.get("users", {}).get(user_id, {})
+        buckets = [
+            (
+                f"{scope}:user:{user_id}",
+                user_config["burst"],
+                parse_rate(user_config["rate"]),
+            )
+        ]
+        if "group_rate" in config:
+            for group_id in sorted(get_membership(request).group_ids):
+                group_config = config | config.get("groups", {}).get(group_id, {})
+                buckets.append(
+                    (
+                        f"{scope}:group:{group_id}",
+                        group_config["group_burst"],
+                        parse_rate(group_config["group_rate"]),
+                    )
+                )
+
+        self.wait_seconds = get_store().take(buckets)
+        return not self.wait_seconds
+
+    def wait(self):
+        return math.ceil(self.wait_seconds)
@@ -2,16 +2,59 @@ from django.shortcuts import render
 
 from django_filters import FilterSet
 from django_filters import filters
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
+from rest_framework.response import Response
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 from rest_framework.decorators import action
 from rest_framework import serializers
-from learning.models import Topic, Group
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.views import APIView
+
+from learning import archive, jobs, leaderboards, reviews
+from learning.batch import run_batch
+from learning.changefeed import ChangeFeedMixin
+from learning.fast_serializers import FastListMixin, ValuesSerializer
+from learning.scoping import (
+    scope_attempts,
+    scope_groups,
+    scope_students,
+    scope_topics,
+)
+from learning.streaming import StreamingListMixin
+from learning.attempts import (
+    AttemptClosed,
+    autosave_answer,
+    complete_attempt,
+    start_attempt,
+)
+from learning.models import (
+    Answer,
+    ArchivedAttempt,
+    Attempt,
+    AttemptQuestion,
+    Choice,
+    Group,
+    GroupStudent,
+    Job,
+    Question,
+    QuestionStats,
+    Topic,
+    TopicStats,
+)
 from accounts.models import Student
+from accounts.permissions import IsStudent, IsTeacherOrReadOnly, IsTeacherOrStaff
+from accounts.roles import get_membership
+import hashlib
+import json
 import os
 
+from django.conf import settings
+
 # Create your views here.
 
 
@@ -29,12 +72,122 @@ class TopicSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class TopicViewSet(viewsets.ModelViewSet):
+class TopicFastSerializer(ValuesSerializer):
+    fields = ("id", "title", "description", "is_active", "change_seq")
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    student = serializers.IntegerField(required=False)
+
+
+class GroupLeaderboardQuerySerializer(LeaderboardQuerySerializer):
+    topic = serializers.IntegerField()
+
+
+def leaderboard_response(request, topic_id, group_id=None):
+    params = LeaderboardQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    student_id = params.validated_data.get("student")
+    own_id = get_membership(request).student_id
+    if student_id is None:
+        student_id = own_id
+    elif (
+        student_id != own_id
+        and not scope_students(Student.objects.filter(pk=student_id), request).exists()
+    ):
+        # место чужого студента показывает его имя и балл — только видимым
+        raise NotFound("Студент не найден.")
+    return Response(
+        {
+            "topic": topic_id,
+            "group": group_id,
+            "top": leaderboards.top(topic_id, group_id, params.validated_data["limit"]),
+            "student": (
+                leaderboards.rank_of(topic_id, student_id, group_id)
+                if student_id
+                else None
+            ),
+        }
+    )
+
+
+class TopicStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TopicStats
+        exclude = ("topic",)
+
+
+class QuestionStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QuestionStats
+        fields = "__all__"
+
+
+class TopicViewSet(
+    ChangeFeedMixin, StreamingListMixin, FastListMixin, viewsets.ModelViewSet
+):
     queryset = Topic.objects.filter()
     serializer_class = TopicSerializer
+    fast_serializer_class = TopicFastSerializer
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrReadOnly]
+    throttle_scope = None
     filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = TopicSetFilter
-    # permission_classes = [DjangoModelPermissionsOrAnonReadOnly]
+
+    def get_queryset(self):
+        return scope_topics(super().get_queryset(), self.request)
+
+    @action(detail=True, methods=["get"], throttle_scope="reports")
+    def leaderboard(self, request, pk=None):
+        topic = self.get_object()
+        return leaderboard_response(request, topic.pk)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        permission_classes=[permissions.IsAuthenticated, IsTeacherOrStaff],
+        throttle_scope="reports",
+    )
+    def stats(self, request, pk=None):
+        # читаем только агрегаты из журнала событий (consume_attempt_events)
+        topic = self.get_object()
+        topic_stats = TopicStats.objects.filter(topic=topic).first() or TopicStats(
+            topic=topic
+        )
+        question_stats = QuestionStats.objects.filter(question__topic=topic)
+        return Response(
+            {
+                "topic": topic.pk,
+                **TopicStatsSerializer(topic_stats).data,
+                "questions": QuestionStatsSerializer(question_stats, many=True).data,
+            }
+        )
+
+
+class ChoiceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Choice
+        fields = ("id", "text", "order", "is_correct")
+
+
+class QuestionSerializer(serializers.ModelSerializer):
+    choices = ChoiceSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Question
+        fields = "__all__"
+
+
+class QuestionViewSet(ChangeFeedMixin, viewsets.ReadOnlyModelViewSet):
+    # банк вопросов с правильными ответами — только для преподавателей
+    queryset = Question.objects.prefetch_related(
+        Prefetch("choices", queryset=Choice.objects.order_by("order", "id"))
+    ).order_by("id")
+    serializer_class = QuestionSerializer
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrStaff]
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filterset_fields = ("topic", "is_active")
 
 
 class GroupSetFilter(FilterSet):
@@ -51,6 +204,11 @@ class GroupSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class GroupFastSerializer(ValuesSerializer):
+    fields = ("id", "name", "description", "is_active", "change_seq", "teacher")
+    many_fields = {"students": (GroupStudent, "group_id", "student_id")}
+
+
 class StudentBriefSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source="user.username", read_only=True)
     email = serializers.EmailField(source="user.email", read_only=True)
@@ -68,12 +226,454 @@ class GroupDetailSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class GroupViewSet(viewsets.ModelViewSet):
-    queryset = Group.objects.prefetch_related("students__user").filter()
+class GroupViewSet(
+    ChangeFeedMixin, StreamingListMixin, FastListMixin, viewsets.ModelViewSet
+):
+    queryset = Group.objects.prefetch_related("students__user").order_by("id")
+    fast_serializer_class = GroupFastSerializer
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrReadOnly]
+    throttle_scope = None
     filter_backends = (DjangoFilterBackend, OrderingFilter)
     filterset_class = GroupSetFilter
 
+    def get_queryset(self):
+        return scope_groups(super().get_queryset(), self.request)
+
+    def perform_create(self, serializer):
+        serializer.save(**self.owner())
+
+    def perform_update(self, serializer):
+        serializer.save(**self.owner())
+
+    def owner(self):
+        # преподаватель не может передать группу другому преподавателю
+        if self.request.user.is_staff:
+            return {}
+        return {"teacher_id": get_membership(self.request).teacher_id}
+
     def get_serializer_class(self):
         if self.action == "retrieve":
             return GroupDetailSerializer
         return GroupSerializer
+
+    @action(detail=True, methods=["get"], throttle_scope="reports")
+    def leaderboard(self, request, pk=None):
+        group = self.get_object()
+        params = GroupLeaderboardQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        topic = get_object_or_404(
+            scope_topics(Topic.objects.all(), request),
+            pk=params.validated_data["topic"],
+        )
+        return leaderboard_response(request, topic.pk, group.pk)
+
+
+class AttemptQuestionSerializer(serializers.ModelSerializer):
+    # текст и варианты — из слепка на момент выдачи; верные варианты
+    # лежат в слепке отдельно и студенту не отдаются
+    text = serializers.CharField(source="snapshot.data.text", read_only=True)
+    choices = serializers.ListField(source="snapshot.data.choices", read_only=True)
+
+    class Meta:
+        model = AttemptQuestion
+        fields = ("id", "order", "question", "text", "choices")
+
+
+class AttemptSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Attempt
+        fields = "__all__"
+
+
+class AttemptDetailSerializer(serializers.ModelSerializer):
+    attempt_questions = AttemptQuestionSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Attempt
+        fields = "__all__"
+
+
+class ReviewQuestionSerializer(serializers.ModelSerializer):
+    text = serializers.CharField(source="snapshot.data.text", read_only=True)
+    choices = serializers.SerializerMethodField()
+    selected_choices = serializers.SerializerMethodField()
+    is_correct = serializers.BooleanField(source="answer.is_correct", read_only=True)
+    teacher_comment = serializers.CharField(
+        source="answer.teacher_comment", read_only=True
+    )
+    answered_at = serializers.DateTimeField(source="answer.answered_at", read_only=True)
+
+    class Meta:
+        model = AttemptQuestion
+        fields = (
+            "id",
+            "order",
+            "question",
+            "text",
+            "choices",
+            "selected_choices",
+            "is_correct",
+            "teacher_comment",
+            "answered_at",
+        )
+
+    def get_choices(self, obj):
+        # верные варианты показываем только после завершения попытки
+        reveal = obj.attempt.status != Attempt.Status.IN_PROGRESS
+        correct = set(obj.snapshot.data["correct"])
+        return [
+            choice | {"is_correct": choice["id"] in correct if reveal else None}
+            for choice in obj.snapshot.data["choices"]
+        ]
+
+    def get_selected_choices(self, obj):
+        answer = getattr(obj, "answer", None)
+        if answer is None:
+            return []
+        return sorted(choice.pk for choice in answer.selected_choices.all())
+
+
+class AttemptReviewSerializer(serializers.ModelSerializer):
+    questions = ReviewQuestionSerializer(
+        source="attempt_questions", many=True, read_only=True
+    )
+
+    class Meta:
+        model = Attempt
+        fields = (
+            "id",
+            "student",
+            "topic",
+            "status",
+            "score",
+            "started_at",
+            "finished_at",
+            "questions",
+        )
+
+
+class TeacherCommentSerializer(serializers.Serializer):
+    attempt_question = serializers.IntegerField()
+    teacher_comment = serializers.CharField(allow_blank=True)
+
+
+class AttemptStartSerializer(serializers.Serializer):
+    topic = serializers.PrimaryKeyRelatedField(
+        queryset=Topic.objects.filter(is_active=True)
+    )
+
+
+class AutosaveSerializer(serializers.Serializer):
+    attempt_question = serializers.IntegerField()
+    selected_choices = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=True
+    )
+
+
+class AttemptViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
+    throttle_scope = None
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filterset_fields = ("topic", "status")
+
+    def get_queryset(self):
+        if self.action in ("start", "autosave", "complete"):
+            # изменять можно только свои попытки
+            queryset = Attempt.objects.filter(
+                student_id=get_membership(self.request).student_id
+            )
+        else:
+            queryset = scope_attempts(Attempt.objects.all(), self.request)
+        if self.action in ("retrieve", "start"):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "attempt_questions",
+                    queryset=AttemptQuestion.objects.select_related("snapshot"),
+                )
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in ("retrieve", "start"):
+            return AttemptDetailSerializer
+        return AttemptSerializer
+
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=[permissions.IsAuthenticated, IsStudent],
+        throttle_scope="attempt_start",
+    )
+    def start(self, request):
+        serializer = AttemptStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        attempt = start_attempt(
+            get_membership(request).student_id, serializer.validated_data["topic"]
+        )
+        attempt = self.get_queryset().get(pk=attempt.pk)
+        return Response(
+            self.get_serializer(attempt).data, status=status.HTTP_201_CREATED
+        )
+
+    @action(
+        detail=True,
+        methods=["post"],
+        permission_classes=[permissions.IsAuthenticated, IsStudent],
+        throttle_scope="attempt_answer",
+    )
+    def autosave(self, request, pk=None):
+        serializer = AutosaveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        attempt_question = get_object_or_404(
+            AttemptQuestion.objects.select_related("attempt", "snapshot"),
+            pk=serializer.validated_data["attempt_question"],
+            attempt_id=pk,
+            attempt__student_id=get_membership(request).student_id,
+        )
+        if attempt_question.attempt.status != Attempt.Status.IN_PROGRESS:
+            return Response(
+                {"detail": "Попытка уже завершена."}, status=status.HTTP_409_CONFLICT
+            )
+
+        choice_ids = set(serializer.validated_data["selected_choices"])
+        valid_ids = {
+            choice["id"] for choice in attempt_question.snapshot.data["choices"]
+        }
+        if choice_ids - valid_ids:
+            raise serializers.ValidationError(
+                {"selected_choices": "Варианты не относятся к этому вопросу."}
+            )
+
+        saved = autosave_answer(attempt_question, choice_ids)
+        return Response(
+            {"saved": saved},
+            status=status.HTTP_200_OK if saved else status.HTTP_202_ACCEPTED,
+        )
+
+    @action(
+        detail=True,
+        methods=["post"],
+        permission_classes=[permissions.IsAuthenticated, IsStudent],
+        throttle_scope="attempt_complete",
+    )
+    def complete(self, request, pk=None):
+        attempt = self.get_object()
+        try:
+            attempt = complete_attempt(attempt)
+        except AttemptClosed:
+            return Response(
+                {"detail": "Попытка уже завершена."}, status=status.HTTP_409_CONFLICT
+            )
+        return Response(AttemptSerializer(attempt).data)
+
+    @action(detail=True, methods=["get"])
+    def review(self, request, pk=None):
+        attempt = self.get_object()
+        data = reviews.get_cached(attempt)
+        if data is None:
+            # три запроса при любом числе вопросов: попытка, вопросы вместе
+            # со слепками и ответами, выбранные варианты
+            prefetch_related_objects(
+                [attempt],
+                Prefetch(
+                    "attempt_questions",
+                    queryset=AttemptQuestion.objects.select_related(
+                        "snapshot", "answer"
+                    ).prefetch_related(
+                        Prefetch(
+                            "answer__selected_choices",
+                            queryset=Choice.objects.only("id"),
+                        )
+                    ),
+                ),
+            )
+            data = AttemptReviewSerializer(attempt).data
+            reviews.store(attempt, data)
+        return Response(data)
+
+    @action(
+        detail=True,
+        methods=["post"],
+        permission_classes=[permissions.IsAuthenticated, IsTeacherOrStaff],
+    )
+    def comment(self, request, pk=None):
+        attempt = self.get_object()
+        serializer = TeacherCommentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        attempt_question = get_object_or_404(
+            AttemptQuestion,
+            pk=serializer.validated_data["attempt_question"],
+            attempt=attempt,
+        )
+        answer, _ = Answer.objects.get_or_create(attempt_question=attempt_question)
+        answer.teacher_comment = serializer.validated_data["teacher_comment"]
+        # post_save сбрасывает закэшированный разбор попытки
+        answer.save(update_fields=["teacher_comment"])
+        return Response(
+            {
+                "attempt_question": attempt_question.pk,
+                "teacher_comment": answer.teacher_comment,
+            }
+        )
+
+
+class ArchivedAttemptSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedAttempt
+        exclude = ("archive_file", "archive_line")
+
+
+class ArchivedAttemptViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = ArchivedAttemptSerializer
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filterset_fields = ("student", "topic", "status")
+
+    def get_queryset(self):
+        return scope_attempts(ArchivedAttempt.objects.all(), self.request)
+
+    def retrieve(self, request, *args, **kwargs):
+        # полные данные читаются из файла архива только по запросу
+        archived = self.get_object()
+        data = self.get_serializer(archived).data
+        data["attempt"] = archive.load_record(archived)
+        return Response(data)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    kind = serializers.ChoiceField(choices=sorted(jobs.HANDLERS))
+
+    class Meta:
+        model = Job
+        fields = (
+            "id",
+            "kind",
+            "params",
+            "priority",
+            "status",
+            "attempts",
+            "max_attempts",
+            "progress",
+            "progress_message",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+        read_only_fields = tuple(
+            field for field in fields if field not in ("kind", "params", "priority")
+        )
+
+
+class TeachingGroupJobSerializer(serializers.Serializer):
+    group = serializers.IntegerField()
+
+    def validate_group(self, value):
+        request = self.context["request"]
+        if not (
+            request.user.is_staff or value in get_membership(request).teaching_group_ids
+        ):
+            raise serializers.ValidationError("Группа недоступна.")
+        return value
+
+
+class GradebookJobSerializer(TeachingGroupJobSerializer):
+    topic = serializers.IntegerField()
+
+
+class GroupNoticeJobSerializer(TeachingGroupJobSerializer):
+    text = serializers.CharField(max_length=4096)
+
+
+# задачи, которые может ставить преподаватель; остальные — только staff
+JOB_PARAMS = {
+    "export_gradebook": GradebookJobSerializer,
+    "notify_group": GroupNoticeJobSerializer,
+}
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsTeacherOrStaff]
+    filter_backends = (DjangoFilterBackend, OrderingFilter)
+    filterset_fields = ("kind", "status")
+
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        kind = serializer.validated_data["kind"]
+        params = serializer.validated_data.get("params") or {}
+        priority = serializer.validated_data.get("priority", 0)
+
+        if kind in JOB_PARAMS:
+            params_serializer = JOB_PARAMS[kind](
+                data=params, context=self.get_serializer_context()
+            )
+            params_serializer.is_valid(raise_exception=True)
+            params = params_serializer.validated_data
+        elif not request.user.is_staff:
+            raise PermissionDenied("Задача доступна только администраторам.")
+        if not request.user.is_staff:
+            priority = 0
+
+        # повторная отправка той же задачи возвращает уже поставленную
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        job, created = jobs.enqueue(
+            kind,
+            params,
+            priority=priority,
+            dedupe_key=f"{kind}:{request.user.pk}:{digest}",
+            user=request.user,
+        )
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        name = (job.result or {}).get("file")
+        if job.status != Job.Status.SUCCEEDED or not name:
+            raise NotFound("У задачи нет готового файла.")
+        return FileResponse(
+            open(jobs.export_dir() / name, "rb"), as_attachment=True, filename=name
+        )
+
+
+class BatchItemSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    path = serializers.CharField(max_length=2000)
+    body = serializers.JSONField(required=False, allow_null=True)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    # только для пакетов из одних GET
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f"Не больше {settings.BATCH_MAX_REQUESTS} запросов в пакете."
+            )
+        return value
+
+
+class BatchView(APIView):
+    """Несколько запросов к API за один HTTP-запрос: {"requests": [...]}."""
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses = run_batch(
+            request,
+            serializer.validated_data["requests"],
+            parallel=serializer.validated_data["parallel"],
+        )
+        return Response({"responses": responses})
@@ -51,8 +51,29 @@ async function _getById(url, id) {
   return response.data;
 }
 
+// Несколько запросов к API за один HTTP-запрос: принимает описания
+// запросов из getRequest/filterRequest и возвращает тела ответов в том же
+// порядке. Подзапрос с ошибкой выбрасывает исключение, как axios.
+export async function batch(requests, { parallel = true } = {}) {
+  const response = await axios.post("/api/batch/", { requests, parallel });
+  return response.data.responses.map((sub) => {
+    if (sub.status >= 400) {
+      const error = new Error(`Request failed with status code ${sub.status}`);
+      error.response = { status: sub.status, data: sub.body };
+      throw error;
+    }
+    return sub.body;
+  });
+}
+
 function apiConstructor(apiUrl) {
   return {
+    getRequest(id) {
+      return { method: "GET", path: apiUrl + id + "/" };
+    },
+    filterRequest(filter) {
+      return { method: "GET", path: apiUrl + "?" + toURLParams(filter) };
+    },
     async save(obj) {
       return _save(apiUrl, obj);
     },